@@ -1,12 +1,37 @@
-from typing import List, Dict, Tuple, Set, Union
+from typing import List, Dict, Tuple, Set, Union, KeysView
 from random import randint, sample, choice
+from array import array
+from collections import deque, OrderedDict
+from functools import lru_cache
+from heapq import heappush, heappop
 import os
+import re
+import string
+import subprocess
 import sys
 root = os.path.normpath(os.path.join(os.path.dirname(__file__)))
 sys.path.append(root)  # allows us to fetch files from the project root
 
+# Lines of the .dot files written by OpenDigraph.save_as_dot_file
+# A node label may end with the " (id: n)" suffix of the verbose mode, an edge label is its multiplicity
+_DOT_NODE_RE = re.compile(r'^\s*v(\d+)\s*\[label="([^"]*?)(?: \(id: \d+\))?"\]\s*;?', re.MULTILINE)
+_DOT_EDGE_RE = re.compile(r'^\s*v(\d+)\s*->\s*v(\d+)\s*(?:\[label="(\d+)"\])?\s*;?', re.MULTILINE)
+
+# Characters of the variable names in the formulas read by BoolCirc.parse_parentheses
+_LETTERS = frozenset(string.ascii_letters)
+
+# Number of searches kept by OpenDigraph.dijkstra for the current version of a graph
+_DIJKSTRA_CACHE_SIZE = 256
+
 
 class Node:
+    # Fixed attributes, no per-instance __dict__
+    __slots__ = ('id', 'label', 'parents', 'children')
+
+    # Number of changes made through the setters and edge methods of any node, a node doesn't know its graph
+    # so the graphs compare it to the value they last saw to know if their caches are still valid
+    _mutations = 0
+    _id_changes = 0  # Same, only for set_id, which also moves the minimum and maximum ids
 
     # Constructor
     def __init__(self, identity: int, label: str, parents: Dict[int, int], children: Dict[int, int]) -> None:
@@ -53,6 +78,8 @@ class Node:
         Changes node id
         :param new_identity: int; its unique id in the graph
         """
+        Node._mutations += 1
+        Node._id_changes += 1
         self.id = new_identity
 
     def set_label(self, new_label: str) -> None:
@@ -60,6 +87,7 @@ class Node:
         Changes node label
         :param new_label: string;
         """
+        Node._mutations += 1
         self.label = new_label
 
     def set_children(self, new_children) -> None:
@@ -67,6 +95,7 @@ class Node:
         Changes node children dict
         :param new_children: int->int dict; maps a child nodes id to its multiplicity
         """
+        Node._mutations += 1
         self.children = new_children
 
     def add_parent_id(self, parent_id) -> None:
@@ -74,20 +103,16 @@ class Node:
         Adds a new parent to node parents dict
         :param parent_id: int;
         """
-        if parent_id in self.get_parents():  # Already a parent
-            self.parents[parent_id] += 1  # Increase the multiplicity
-        else:  # Not yet a parent
-            self.parents[parent_id] = 1
+        Node._mutations += 1
+        self.parents[parent_id] = self.parents.get(parent_id, 0) + 1  # Increase the multiplicity, 1 if not yet a parent
 
     def add_child_id(self, child_id):
         """
         Adds a new child to node children dict
         :param child_id: int;
         """
-        if child_id in self.get_children():  # Already a child
-            self.children[child_id] += 1  # Increase the multiplicity
-        else:  # Not yet a child
-            self.children[child_id] = 1
+        Node._mutations += 1
+        self.children[child_id] = self.children.get(child_id, 0) + 1  # Increase the multiplicity, 1 if not yet a child
 
     # Printing methods
     def __str__(self) -> str:
@@ -108,74 +133,84 @@ class Node:
         Implementation of the "==" between two nodes
         :param other: Node;
         """
-        return (self.get_id() == other.get_id() and self.get_label() == other.get_label() and
-                self.get_parents() == other.get_parents() and self.get_children() == other.get_children())
+        if self is other:
+            return True
+        # Cheap scalar comparisons first, the dicts are only compared when they match
+        return (self.id == other.id and self.label == other.label and
+                self.parents == other.parents and self.children == other.children)
 
     def copy(self):
         """
-        Creates a copy of the node
+        Creates a copy of the node, its parents and children dicts are copied too
         """
-        return Node(self.get_id(), self.get_label(), self.get_parents(), self.get_children())
+        return Node(self.id, self.label, self.parents.copy(), self.children.copy())
 
     def remove_parent_once(self, identity: int) -> None:
         """
         Removes an occurrence of the parent
         :param identity: int;
         """
-        if identity in self.get_parents():
-            if self.get_parents()[identity] <= 1:
+        Node._mutations += 1
+        multiplicity = self.parents.get(identity)
+        if multiplicity is not None:
+            if multiplicity <= 1:
                 del self.parents[identity]
             else:
-                self.parents[identity] -= 1
+                self.parents[identity] = multiplicity - 1
 
     def remove_child_once(self, identity: int) -> None:
         """
         Removes an occurrence of the child
         :param identity: int;
         """
-        if identity in self.get_children():
-            if self.get_children()[identity] <= 1:
+        Node._mutations += 1
+        multiplicity = self.children.get(identity)
+        if multiplicity is not None:
+            if multiplicity <= 1:
                 del self.children[identity]
             else:
-                self.children[identity] -= 1
+                self.children[identity] = multiplicity - 1
 
     def remove_parent_id(self, identity: int) -> None:
         """
         Removes a given parent
         :param identity: int;
         """
-        if identity in self.get_parents():
-            del self.parents[identity]
+        Node._mutations += 1
+        self.parents.pop(identity, None)
 
     def remove_child_id(self, identity: int) -> None:
         """
         Removes a given child
         :param identity: int;
         """
-        if identity in self.get_children():
-            del self.children[identity]
+        Node._mutations += 1
+        self.children.pop(identity, None)
 
     def indegree(self) -> int:
         """
         Calculates the incoming degree of a node in the graph
         """
-        return len(self.get_parents())
+        return len(self.parents)
 
     def outdegree(self) -> int:
         """
         Calculates the outgoing degree of a node in the graph
         """
-        return len(self.get_children())
+        return len(self.children)
 
     def degree(self) -> int:
         """
         Calculates the total degree of a node in the graph
         """
-        return self.indegree() + self.outdegree()
+        return len(self.parents) + len(self.children)
         # return self.indegree() - self.outdegree()
 
 
 class OpenDigraph:  # for open directed graph
+    # Fixed attributes, no per-instance __dict__ (subclasses still get one unless they declare __slots__)
+    __slots__ = ('inputs', 'outputs', 'nodes', '_csr', '_dirty', '_min_id', '_max_id', '_version', '_cache',
+                 '_node_mutations', '_node_id_changes')
 
     # Constructors
     def __init__(self, inputs: List[int] = None, outputs: List[int] = None, nodes: List[Node] = None) -> None:
@@ -201,6 +236,16 @@ class OpenDigraph:  # for open directed graph
         else:
             self.nodes = {node.id: node for node in nodes}  # self.nodes: <int,node> dict
 
+        # Cached values, dropped by _invalidate
+        self._csr = None  # CSR form of the graph, see to_csr
+        self._dirty = True  # True if _min_id and _max_id must be recomputed
+        self._min_id = float('inf')
+        self._max_id = float('-inf')
+        self._version = 0  # Bumped on every change, see _invalidate
+        self._cache = {}  # 'dijkstra' -> (version, {(src, direction): runs}), see dijkstra
+        self._node_mutations = Node._mutations  # Last value of Node._mutations seen, see _sync
+        self._node_id_changes = Node._id_changes  # Last value of Node._id_changes seen, see _sync
+
     @classmethod
     def empty(cls):
         """
@@ -233,11 +278,12 @@ class OpenDigraph:  # for open directed graph
         """
         return list(self.nodes.values())
 
-    def get_node_ids(self) -> List[int]:
+    def get_node_ids(self) -> KeysView[int]:
         """
-        Returns a list of all the ids
+        Returns a view of all the ids, it follows the changes of the graph
+        (take a list of it to add or remove nodes while iterating)
         """
-        return list(self.nodes.keys())
+        return self.nodes.keys()
 
     def get_node_by_id(self, node_id: int) -> Node:
         """
@@ -257,46 +303,50 @@ class OpenDigraph:  # for open directed graph
         Changes digraph input list
         :param new_inputs: List[int];
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes  # Dict membership is O(1), a list of ids would be O(n)
         for i in new_inputs:
             if i not in nodes:  # An ID doesn't exist
                 raise ValueError("A given ID doesn't exist")
                 # We will also have to check that the graph is still well-formed later
         self.inputs = new_inputs
+        self._version += 1  # The inputs are checked by is_well_formed
 
     def set_outputs(self, new_outputs: List[int]) -> None:
         """
         Changes digraph output list
         :param new_outputs: List[int];
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes  # Dict membership is O(1), a list of ids would be O(n)
         for i in new_outputs:
             if i not in nodes:  # An ID doesn't exist
                 raise ValueError("A given ID doesn't exist")
                 # We will also have to check that the graph is still well-formed later
         self.outputs = new_outputs
+        self._version += 1  # The outputs are checked by is_well_formed
 
     def add_input_id(self, input_id: int) -> None:
         """
         Adds a new input to the input list
         :param input_id: int;
         """
-        if input_id not in self.get_input_ids():  # Useless to add it twice
-            if input_id in self.get_node_ids():  # Check that the ID exists
+        if input_id not in self.inputs:  # Useless to add it twice
+            if input_id in self.nodes:  # Check that the ID exists
                 self.inputs.append(input_id)
+                self._version += 1
             else:
-                ValueError("ID doesn't exist")  # We will also have to check that the graph is still well-formed later
+                raise ValueError("ID doesn't exist")  # We will also have to check that the graph is still well-formed later
 
     def add_output_id(self, output_id: int) -> None:
         """
         Adds a new input to the input list
         :param output_id: int;
         """
-        if output_id not in self.get_output_ids():  # Useless to add it twice
-            if output_id in self.get_node_ids():  # Check that the ID exists
+        if output_id not in self.outputs:  # Useless to add it twice
+            if output_id in self.nodes:  # Check that the ID exists
                 self.outputs.append(output_id)
+                self._version += 1
             else:
-                ValueError("ID doesn't exist")  # We will also have to check that the graph is still well-formed later
+                raise ValueError("ID doesn't exist")  # We will also have to check that the graph is still well-formed later
 
     # Printing methods
     def __str__(self) -> str:
@@ -312,42 +362,103 @@ class OpenDigraph:  # for open directed graph
         return str(self)
 
     # Methods
+    def _invalidate(self, ids: bool = True) -> None:
+        """
+        Drops the cached representations of the graph and bumps its version, must be called after every change
+        :param ids: bool; if False, the cached minimum and maximum ids are kept, the caller updates them
+        """
+        self._csr = None
+        self._version += 1
+        self._cache.clear()  # Every entry belongs to an older version now
+        if ids:
+            self._dirty = True
+
+    def _sync(self) -> None:
+        """
+        Drops the cached values if a node was changed through its own methods (add_child_id, set_label, ...)
+        since they were computed. Any node counts, as the nodes don't know which graph they belong to.
+        The minimum and maximum ids are only recomputed if an id was changed (set_id)
+        """
+        if self._node_mutations != Node._mutations:
+            self._node_mutations = Node._mutations
+            self._invalidate(ids=self._node_id_changes != Node._id_changes)
+            self._node_id_changes = Node._id_changes
+
+    def _recompute(self) -> None:
+        """
+        Recomputes the cached minimum and maximum ids in a single pass
+        """
+        ids = [node.id for node in self.nodes.values()]
+        self._min_id = min(ids, default=float('inf'))
+        self._max_id = max(ids, default=float('-inf'))
+        self._dirty = False
+
     def __eq__(self, other) -> bool:
         """
         Implementation of the "==" between two digraphs
         :param other: OpenDigraph;
         """
-        return (self.get_input_ids() == other.get_input_ids() and self.get_output_ids() == other.get_output_ids()
-                and self.get_nodes() == other.get_nodes())
+        if self is other:
+            return True
+        return (self.inputs == other.inputs and self.outputs == other.outputs and
+                len(self.nodes) == len(other.nodes) and list(self.nodes.values()) == list(other.nodes.values()))
 
     def copy(self):
         """
-        Creates a copy of the graph
+        Creates a copy of the graph, nodes are copied too so the copy can be modified independently
         """
-        return OpenDigraph(list(self.get_input_ids()), list(self.get_output_ids()),
-                           list(self.get_nodes_by_ids(self.get_node_ids())))
+        g = OpenDigraph.empty()
+        g.inputs = self.inputs.copy()
+        g.outputs = self.outputs.copy()
+        g.nodes = {node_id: node.copy() for node_id, node in self.nodes.items()}
+
+        # Same nodes, same extrema
+        self._sync()
+        g._dirty = self._dirty
+        g._min_id = self._min_id
+        g._max_id = self._max_id
+        return g
 
     def new_id(self):
         """
         Finds and return an unused ID in the graph
         """
-        used_ids = set(self.get_input_ids() + self.get_output_ids() + list(self.get_node_ids()))
-        return max(used_ids) + 1 if used_ids else 0  # If there's no existing id, return 0, else the max + 1
+        max_used = max([self.max_id(), *self.inputs, *self.outputs])  # max_id is cached, inputs/outputs are short
+        if max_used + 1 in self.nodes:  # A node was stored without the graph knowing, the cached maximum is stale
+            self._recompute()
+            max_used = max([self._max_id, *self.inputs, *self.outputs])
+        return max_used + 1 if max_used != float('-inf') else 0  # If there's no existing id, return 0, else the max + 1
         # We suppose that if we have n ids, they all go from 0 to n-1
         # Still doesn't cause any problem if we don't have that condition
         # We'll just have ids not numerotated from 0 to n-1
         # But this function is faster (O(n)) than checking for the first unused id from 0 to n (O(n^2))
 
+    def _next_id(self) -> int:
+        """
+        Returns the id following the maximum id of the graph (0 if it's empty) and records it as the new maximum,
+        the caller must add a node with this id right after
+        :return: int; the reserved id
+        """
+        max_id = self.max_id()
+        if max_id + 1 in self.nodes:  # A node was stored without the graph knowing, the cached maximum is stale
+            self._recompute()
+            max_id = self._max_id
+        next_id = max_id + 1 if max_id != float('-inf') else 0
+        self._max_id = next_id
+        self._min_id = min(self._min_id, next_id)
+        return next_id
+
     def add_edge(self, src: int, tgt: int) -> None:
         """
         Adds an edge from the source node to the target node
         :param src: int; id of the source node
         :param tgt: int; id of the target node
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes
         if src in nodes and tgt in nodes:
-            self.get_node_by_id(src).add_child_id(tgt)  # Add a child to the source node
-            self.get_node_by_id(tgt).add_parent_id(src)  # Add a parent to the target node
+            nodes[src].add_child_id(tgt)  # Add a child to the source node
+            nodes[tgt].add_parent_id(src)  # Add a parent to the target node
+            self._invalidate(ids=False)  # The nodes stay the same
         else:
             raise ValueError("src or tgt doesn't exist")
 
@@ -356,8 +467,15 @@ class OpenDigraph:  # for open directed graph
         Adds edges between each pair of node IDs in the list of edges
         :param edges: list(tuple(int, int)); list of edges to add (int; source node, int; target node)
         """
+        nodes = self.nodes
+        self._invalidate(ids=False)  # Once for the whole batch, the nodes stay the same
         for src, tgt in edges:
-            self.add_edge(src, tgt)
+            s = nodes.get(src)
+            t = nodes.get(tgt)
+            if s is None or t is None:
+                raise ValueError("src or tgt doesn't exist")
+            s.children[tgt] = s.children.get(tgt, 0) + 1  # Add a child to the source node
+            t.parents[src] = t.parents.get(src, 0) + 1  # Add a parent to the target node
 
     def remove_edge(self, src: int, tgt: int) -> None:
         """
@@ -365,10 +483,11 @@ class OpenDigraph:  # for open directed graph
         :param src: int; id of the source node
         :param tgt: int; id of the target node
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes
         if src in nodes and tgt in nodes:
-            self.get_node_by_id(tgt).remove_child_once(src)  # Remove a child of the source node
-            self.get_node_by_id(src).remove_parent_once(tgt)  # Remove a parent of the target node
+            nodes[tgt].remove_child_once(src)  # Remove a child of the source node
+            nodes[src].remove_parent_once(tgt)  # Remove a parent of the target node
+            self._invalidate(ids=False)  # The nodes stay the same
         else:
             raise ValueError("src or tgt doesn't exist")
 
@@ -377,8 +496,16 @@ class OpenDigraph:  # for open directed graph
         Removes an edge between each pair of node IDs in the list of edges
         :param edges: list(tuple(int, int)); list of edges to add (int; source node, int; target node)
         """
+        nodes = self.nodes
+        self._invalidate(ids=False)  # Once for the whole batch, the nodes stay the same
         for src, tgt in edges:
-            self.remove_edge(src, tgt)
+            s = nodes.get(src)
+            t = nodes.get(tgt)
+            if s is None or t is None:
+                raise ValueError("src or tgt doesn't exist")
+            # Same as remove_edge
+            t.remove_child_once(src)
+            s.remove_parent_once(tgt)
 
     def remove_parallel_edges(self, src: int, tgt: int) -> None:
         """
@@ -386,10 +513,11 @@ class OpenDigraph:  # for open directed graph
         :param src: int; id of the source node
         :param tgt: int; id of the target node
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes
         if src in nodes and tgt in nodes:
-            self.get_node_by_id(tgt).remove_parent_id(src)  # Remove all parents of the source node
-            self.get_node_by_id(src).remove_child_id(tgt)  # Remove all children of the target node
+            nodes[tgt].remove_parent_id(src)  # Remove all parents of the source node
+            nodes[src].remove_child_id(tgt)  # Remove all children of the target node
+            self._invalidate(ids=False)  # The nodes stay the same
         else:
             raise ValueError("src or tgt doesn't exist")
 
@@ -398,8 +526,29 @@ class OpenDigraph:  # for open directed graph
         Removes all edges between each pair of node IDs in the list of edges
         :param edges: list(tuple(int, int)); list of edges to add (int; source node, int; target node)
         """
+        nodes = self.nodes
+        self._invalidate(ids=False)  # Once for the whole batch, the nodes stay the same
         for src, tgt in edges:
-            self.remove_parallel_edges(src, tgt)
+            s = nodes.get(src)
+            t = nodes.get(tgt)
+            if s is None or t is None:
+                raise ValueError("src or tgt doesn't exist")
+            t.parents.pop(src, None)  # Remove all parents of the source node
+            s.children.pop(tgt, None)  # Remove all children of the target node
+
+    def remove_all_incoming(self, node_id: int) -> None:
+        """
+        Removes all the edges coming into a node, in a single pass over its parents
+        :param node_id: int; id of the node
+        """
+        nodes = self.nodes
+        node = nodes.get(node_id)
+        if node is None:
+            raise ValueError("node_id doesn't exist")
+        for pred in node.parents:
+            nodes[pred].children.pop(node_id, None)
+        node.parents = {}
+        self._invalidate(ids=False)
 
     def add_node(self, label="", parents=None, children=None) -> int:
         """
@@ -411,7 +560,7 @@ class OpenDigraph:  # for open directed graph
         :param parents: List[int]; ids of the parents
         :param children: List[int]; ids of the childrens
         """
-        nodes = self.get_node_ids()
+        nodes = self.nodes
         # Create a new object Node
         new_node = Node(self.new_id(), label, {}, {})
         if parents is not None:
@@ -428,9 +577,15 @@ class OpenDigraph:  # for open directed graph
                     raise ValueError("One child doesn't exist")
 
         # Add the new node to the graph
-        self.nodes[new_node.get_id()] = new_node
+        nodes[new_node.id] = new_node
+        dirty = self._dirty
+        self._invalidate()
+        if not dirty:  # The cached extrema can be updated without a rescan
+            self._min_id = min(self._min_id, new_node.id)
+            self._max_id = max(self._max_id, new_node.id)
+            self._dirty = False
 
-        return new_node.get_id()
+        return new_node.id
 
     def add_input_node(self, node_id: int, child_id: int) -> None:
         """
@@ -439,9 +594,9 @@ class OpenDigraph:  # for open directed graph
         :param child_id: int; id of the child node
         """
         # Asserts to keep the graph well-formed
-        if node_id in self.get_node_ids():
+        if node_id in self.nodes:
             raise ValueError("Node already exists")
-        if child_id not in self.get_node_ids():
+        if child_id not in self.nodes:
             raise ValueError("Child doesn't exist")
 
         # Create a new input node with no parents and one child
@@ -457,9 +612,9 @@ class OpenDigraph:  # for open directed graph
         :param parent_id: int; id of the parent node
         """
         # Asserts to keep the graph well-formed
-        if node_id in self.get_node_ids():
+        if node_id in self.nodes:
             raise ValueError("Node already exists")
-        if parent_id not in self.get_node_ids():
+        if parent_id not in self.nodes:
             raise ValueError("Parent doesn't exist")
 
         # Create a new output node with one parent and no children
@@ -473,89 +628,73 @@ class OpenDigraph:  # for open directed graph
         Removes a node from its id
         :param identity: int; id of the node to remove
         """
-        if identity in self.get_node_ids():
-
-            parents = list(self.get_node_by_id(identity).get_parents().keys())
-            children = list(self.get_node_by_id(identity).get_children().keys())
-            for parent in parents:  # Remove all links with parents
-                self.remove_parallel_edges(parent, identity)
-            for child in children:  # Remove all links with children
-                self.remove_parallel_edges(identity, child)
-            self.nodes.pop(identity)
-
-            inputs = self.get_input_ids()
-            outputs = self.get_output_ids()
-            if identity in inputs:  # Check if the node was an input
-                self.set_inputs([node for node in inputs if node != identity])
-            elif identity in outputs:  # Check if the node was an output
-                self.set_inputs([node for node in outputs if node != identity])
+        self.remove_nodes_by_id([identity])
 
     def remove_nodes_by_id(self, ids: List[int]) -> None:
         """
-        Removes all nodes with IDs in the list of edges
+        Removes all nodes with IDs in the list of edges, unknown IDs are ignored
         :param ids: list(int); list of nodes to remove
         """
+        nodes = self.nodes
+        removed = set()
         for identity in ids:
-            self.remove_id(identity)
+            node = nodes.pop(identity, None)
+            if node is None:  # Unknown or already removed
+                continue
+            removed.add(identity)
+            for parent in node.parents:  # Remove all links with parents
+                if parent in nodes:
+                    nodes[parent].children.pop(identity, None)
+            for child in node.children:  # Remove all links with children
+                if child in nodes:
+                    nodes[child].parents.pop(identity, None)
+
+        if removed:
+            # Inputs and outputs are filtered once for the whole batch
+            self.inputs = [node for node in self.inputs if node not in removed]
+            self.outputs = [node for node in self.outputs if node not in removed]
+            self._invalidate()
 
     def is_well_formed(self) -> bool:
         """
         Returns True if the graph is well-formed, else False
         """
         # Getters
-        node_ids = self.get_node_ids()
+        nodes = self.nodes
         input_ids = self.get_input_ids()
         output_ids = self.get_output_ids()
 
         # Property 1: Check if each input and output node is in the graph
         for input_id in input_ids:  # inputs
-            if input_id not in node_ids:
+            if input_id not in nodes:
                 return False
         for output_id in output_ids:  # outputs
-            if output_id not in node_ids:
+            if output_id not in nodes:
                 return False
 
-        # Property 2: Check if each input node has a single child and no parent
-        for input_id in input_ids:
-            input_node = self.get_node_by_id(input_id)
-            children = input_node.get_children()
-            parents = input_node.get_parents()
-            if len(children) != 1 or len(parents) > 0:  # Wrong number of children or have parent(s)
+        # Property 4: Check if each key in nodes corresponds to a node which has the key as id
+        for node_id, node in nodes.items():
+            if node.id != node_id:
                 return False
-            for child_multiplicity in children.values():  # At this step, it's exactly one value
-                if child_multiplicity != 1:  # Wrong multiplicity
-                    return False
 
-        # Property 3: Check if each output node has a single parent and no children
-        for output_id in output_ids:
-            output_node = self.get_node_by_id(output_id)
-            children = output_node.get_children()
-            parents = output_node.get_parents()
-            if len(children) > 0 or len(parents) != 1:  # Wrong number of parents or have child(ren)
+        # Property 2: Check if each input node has a single child, of multiplicity 1, and no parent
+        for input_id in input_ids:
+            node = nodes[input_id]
+            if node.parents or list(node.children.values()) != [1]:
                 return False
-            for parent_multiplicity in parents.values():  # At this step, it's exactly one value
-                if parent_multiplicity != 1:    # Wrong multiplicity
-                    return False
 
-        # Property 4: Check if each key in nodes corresponds to a node which has the key as id
-        for node_id, node in self.get_id_node_map().items():
-            if node.get_id() != node_id:
+        # Property 3: Check if each output node has a single parent, of multiplicity 1, and no children
+        for output_id in output_ids:
+            node = nodes[output_id]
+            if node.children or list(node.parents.values()) != [1]:
                 return False
 
         # Property 5: Check the relationship between parents and children
-        for node_id, node in self.get_id_node_map().items():
-            for child_id, multiplicity in node.get_children().items():  # child->parent
-                child = self.get_node_by_id(child_id)
-                parents = child.get_parents()
-                if node_id not in parents or parents[node_id] != multiplicity:
-                    return False
-            for parent_id, multiplicity in node.get_parents().items():  # parent->child
-                parent = self.get_node_by_id(parent_id)
-                children = parent.get_children()
-                if node_id not in children or children[node_id] != multiplicity:
-                    return False
-
-        return True
+        # The edges declared by the children must be exactly the edges declared by the parents,
+        # an edge towards a node outside the graph only appears on one side
+        children_edges = {(u, v): m for u, node in nodes.items() for v, m in node.children.items()}
+        parents_edges = {(u, v): m for v, node in nodes.items() for u, m in node.parents.items()}
+        return children_edges == parents_edges
 
     def assert_is_well_formed(self) -> None:
         """
@@ -578,39 +717,25 @@ class OpenDigraph:  # for open directed graph
         if inputs < 0 or outputs < 0 or n < inputs + outputs:
             raise ValueError("Invalid input/output values")
 
-        # Generate adjacency matrix according to the specified form
-        if form == "free":
-            matrix = random_int_matrix(n, bound)
-        elif form == "DAG":
-            matrix = random_int_matrix(n, bound, dag=True)
-        elif form == "oriented":
-            matrix = random_int_matrix(n, bound, oriented=True)
-        elif form == "loop-free":
-            matrix = random_int_matrix(n, bound, null_diag=True)
-        elif form == "undirected":
-            matrix = random_int_matrix(n, bound, symmetric=True)
-        elif form == "loop-free_undirected":
-            matrix = random_int_matrix(n, bound, symmetric=True, null_diag=True)
-        else:
+        if form not in ("free", "DAG", "oriented", "loop-free", "undirected", "loop-free_undirected"):
             raise ValueError("Invalid graph form")
 
-        # Create OpenDigraph instance from adjacency matrix
-        graph = graph_from_adjacency_matrix(matrix)
-
-        # Select inputs and outputs randomly (by checking for every node if it's a possible input/output node)
-        node_ids = graph.get_node_ids()
+        # Draw the edges according to the specified form, without building the adjacency matrix
+        rows, cols, vals = _random_edges(n, bound, form)
+        graph = _graph_from_edges(n, rows, cols, vals)
 
-        inputs_list = [i for i in node_ids if len(graph.get_node_by_id(i).get_parents()) == 0 and
-                       len(graph.get_node_by_id(i).get_children()) == 1]
+        # Select inputs and outputs randomly among the nodes that can be an input/output node
+        inputs_list = [i for i, node in graph.nodes.items() if not node.parents and len(node.children) == 1]
         if len(inputs_list) < inputs:
             raise ValueError("This graph has too few possibilities for inputs nodes")
-        inputs_list = sample(node_ids, inputs)
+        inputs_list = sample(inputs_list, inputs)  # Without replacement
 
-        outputs_list = [i for i in node_ids if len(graph.get_node_by_id(i).get_children()) == 0 and
-                        len(graph.get_node_by_id(i).get_parents()) == 1 and i not in inputs_list]
+        chosen_inputs = set(inputs_list)
+        outputs_list = [i for i, node in graph.nodes.items() if not node.children and len(node.parents) == 1 and
+                        i not in chosen_inputs]
         if len(outputs_list) < outputs:
             raise ValueError("This graph has too few possibilities for outputs nodes")
-        outputs_list = sample(node_ids, outputs)
+        outputs_list = sample(outputs_list, outputs)
         
         for node_id in inputs_list:
             graph.add_input_id(node_id)
@@ -629,51 +754,113 @@ class OpenDigraph:  # for open directed graph
         node_index_map = {node_id: index for index, node_id in enumerate(node_ids)}  # Map each node ID to its index
         return node_index_map
 
+    def to_csr(self) -> Tuple[array, array, array]:
+        """
+        Returns the compressed sparse row (CSR) form of the graph, ignoring inputs and outputs.
+        Row and column i correspond to the node of index i in node_id_to_index_map.
+        The edges of row i are stored in indices[indptr[i]:indptr[i + 1]], sorted by column.
+        The result is cached until the next modification of the graph (see _sync) and must not be modified.
+        Raises a KeyError if a node has a child that isn't in the graph.
+        :return: Tuple[array, array, array]; indptr (n + 1 row offsets), indices (column of each edge)
+                 and data (multiplicity of each edge)
+        """
+        self._sync()
+        if self._csr is None:
+            self._csr = self._build_csr()
+        return self._csr
+
+    def _build_csr(self) -> Tuple[array, array, array]:
+        """
+        Builds the CSR form of the graph described in to_csr, without reading or filling the cache
+        :return: Tuple[array, array, array]; indptr, indices and data
+        """
+        id_to_idx = self.node_id_to_index_map()
+        nodes = self.nodes
+        n = len(id_to_idx)
+
+        # First pass: count the edges of each row, then turn the counts into offsets
+        indptr = array('i', [0]) * (n + 1)
+        for node_id, i in id_to_idx.items():
+            indptr[i + 1] = len(nodes[node_id].children)
+        for i in range(n):
+            indptr[i + 1] += indptr[i]
+
+        # Second pass: write the edges of each row at its offset
+        indices = array('i', [0]) * indptr[n]
+        data = array('i', [0]) * indptr[n]
+        for node_id, i in id_to_idx.items():
+            k = indptr[i]
+            for j, multiplicity in sorted((id_to_idx[c], m) for c, m in nodes[node_id].children.items()):
+                indices[k] = j
+                data[k] = multiplicity
+                k += 1
+
+        return indptr, indices, data
+
+    def to_scipy_sparse(self, fmt: str = 'csr'):
+        """
+        Returns the adjacency matrix of the graph as a SciPy sparse matrix, built from a fresh CSR form (see to_csr)
+        without densifying, so that the algorithms of scipy.sparse.csgraph can be used on the graph.
+        SciPy is only needed, and imported, when this method is called.
+        :param fmt: str; sparse format of the result ('csr', 'csc', 'coo', ...)
+        :return: scipy.sparse matrix; rows and columns ordered as in node_id_to_index_map
+        """
+        from scipy.sparse import csr_matrix
+
+        indptr, indices, data = self._build_csr()  # Not the cached arrays, the matrix may share them
+        n = len(indptr) - 1
+        return csr_matrix((data, indices, indptr), shape=(n, n)).asformat(fmt)
+
     def adjacency_matrix(self) -> List[List[int]]:
         """
         Generates an adjacency matrix for the graph, ignoring inputs and outputs.
         Considers all nodes in the graph.
         :return: List[List[int]]; The adjacency matrix representing the connections between nodes.
         """
-        # Get all nodes and their IDs
-        nodes = self.get_nodes()
-        node_ids = self.get_node_ids()
-        
+        indptr, indices, data = self._build_csr()  # Read from the nodes as they are now, not from the cache
+
         # Initialize the adjacency matrix
-        n = len(node_ids)
-        adj_matrix = [[0 for _ in range(n)] for _ in range(n)]
-        
-        # Populate the adjacency matrix based on connections between nodes
-        for node in nodes:
-            node_id = node.get_id()
-            children = node.get_children()
-            for child_id, child_value in children.items():
-                adj_matrix[node_id][child_id] = child_value  # Set the corresponding cell to 1
-                
+        n = len(indptr) - 1
+        adj_matrix = [[0] * n for _ in range(n)]  # Rows are allocated in one go, without a Python loop per cell
+
+        # Populate the adjacency matrix row by row from the CSR form
+        for i in range(n):
+            row = adj_matrix[i]
+            for k in range(indptr[i], indptr[i + 1]):
+                row[indices[k]] = data[k]
+
         return adj_matrix
 
+    def _render_dot_string(self, verbose=False) -> str:
+        """
+        Returns the graph in .dot format.
+        :param verbose: bool; if True, includes both label and id for nodes
+        :return: str; the .dot source of the graph
+        """
+        parts = ["digraph G {\n"]
+
+        # Nodes
+        if verbose:
+            parts.extend(f"v{node.id} [label=\"{node.label} (id: {node.id})\"];\n" for node in self.nodes.values())
+        else:
+            parts.extend(f"v{node.id} [label=\"{node.label}\"];\n" for node in self.nodes.values())
+
+        # Edges
+        parts.extend(f"v{node.id} -> v{child_id} [label=\"{multiplicity}\"];\n"
+                     for node in self.nodes.values() for child_id, multiplicity in node.children.items())
+
+        parts.append("}\n")
+        return "".join(parts)
+
     def save_as_dot_file(self, path, verbose=False) -> None:
         """
         Save the graph in .dot format at the specified path.
         :param path: str; the path where the .dot file will be saved
         :param verbose: bool; if True, includes both label and id for nodes
         """
+        # A single write instead of one per node and per edge
         with open(path, 'w') as file:
-            file.write("digraph G {\n")
-            
-            # Write nodes
-            for node in self.get_nodes():
-                label = node.get_label()
-                if verbose:
-                    label = f"{node.get_label()} (id: {node.get_id()})"
-                file.write(f"v{node.get_id()} [label=\"{label}\"];\n")
-            
-            # Write edges
-            for node in self.get_nodes():
-                for child_id, multiplicity in node.get_children().items():
-                    file.write(f"v{node.get_id()} -> v{child_id} [label=\"{multiplicity}\"];\n")
-            
-            file.write("}\n")
+            file.write(self._render_dot_string(verbose))
     
     @classmethod
     def from_dot_file(cls, path: str) -> 'OpenDigraph':
@@ -682,180 +869,155 @@ class OpenDigraph:  # for open directed graph
         :param path: str; Path to the .dot file
         :return: OpenDigraph; An instance of OpenDigraph constructed from the .dot file
         """
-        inputs = []
-        outputs = []
-        nodes = []
-        
         with open(path, 'r') as file:
-            lines = file.readlines()
-        # Parse the lines to extract node information
-            for line in lines:
-                clean_line = line.strip()
-                if clean_line.startswith("v"):
-                    parts = clean_line.split('[label="')
-                    node_id = parts[0].strip()
-                    if node_id.isdigit():
-                        node_id = int(node_id)
-                    label_parts = parts[1].split('"')
-                    if len(label_parts) > 1:
-                        label = label_parts[1]
-                    else:
-                        label = None
-                    if '"' in parts[1]:
-                        verbose = True
-                    else:
-                        verbose = False
-                    if verbose:
-                        label += f" ({node_id})"
-                    nodes.append(Node(identity=node_id, label=label, parents={}, children={}))
-
-                elif "->" in clean_line:
-                    parts = line.split('->')
-                    src = int(parts[0].strip())
-                    tgt = int(parts[1].split(';')[0].strip())
-                    nodes[src - 1].add_child_id(tgt)
-                    nodes[tgt - 1].add_parent_id(src)
-
-        # Identify input and output nodes
-        for node in nodes:
-            if node.get_id() in node.get_parents():
-                inputs.append(node.get_id())
-            if node.get_id() in node.get_children():
-                outputs.append(node.get_id())
-
-        return cls(inputs=inputs, outputs=outputs, nodes=nodes)
+            text = file.read()
+
+        # Nodes, indexed by their id
+        nodes = {}
+        for match in _DOT_NODE_RE.finditer(text):
+            node_id = int(match[1])
+            nodes[node_id] = Node(identity=node_id, label=match[2], parents={}, children={})
+
+        # Edges, an edge without label has multiplicity 1
+        for match in _DOT_EDGE_RE.finditer(text):
+            src, tgt = int(match[1]), int(match[2])
+            if src not in nodes or tgt not in nodes:
+                raise ValueError("An edge links an undeclared node")
+            multiplicity = int(match[3]) if match[3] else 1
+            nodes[src].children[tgt] = nodes[src].children.get(tgt, 0) + multiplicity
+            nodes[tgt].parents[src] = nodes[tgt].parents.get(src, 0) + multiplicity
+
+        # Identify input and output nodes (a single child/parent of multiplicity 1, nothing on the other side)
+        inputs = [node_id for node_id, node in nodes.items()
+                  if not node.parents and list(node.children.values()) == [1]]
+        outputs = [node_id for node_id, node in nodes.items()
+                   if not node.children and list(node.parents.values()) == [1]]
+
+        return cls(inputs=inputs, outputs=outputs, nodes=list(nodes.values()))
 
     def display(self, verbose=False) -> None:
         """
         Displays the graph representation.
         :param verbose: bool; If True, includes both label and id for nodes in the graph
         """
-        # Create a temporary location to store the .dot file
-        dot_file = "temp_graph.dot"
-
-        # Save the graph as a .dot file
-        self.save_as_dot_file(dot_file, verbose)
-
-        # Open the .dot file with a local viewer (assuming Graphviz is installed)
-        os.system(f"dot -Tpdf {dot_file} -o temp_graph.pdf")
-        os.system("xdg-open temp_graph.pdf")  # For Linux, opens the PDF file with the default viewer
+        # Pipe the .dot source straight into Graphviz (assuming it is installed), no shell and no .dot file
+        pdf = subprocess.run(["dot", "-Tpdf"], input=self._render_dot_string(verbose).encode(),
+                             capture_output=True, check=True).stdout
+        with open("temp_graph.pdf", 'wb') as file:
+            file.write(pdf)
+        subprocess.run(["xdg-open", "temp_graph.pdf"])  # For Linux, opens the PDF file with the default viewer
 
-        # Remove temporary files
-        os.remove(dot_file)
+        # Remove temporary file
         os.remove("temp_graph.pdf")
 
     def is_cyclic(self) -> bool:
         """
-        Checks if the directed graph contains a cycle using depth-first search (DFS).
+        Checks if the directed graph contains a cycle using Kahn's algorithm, iterative so deep graphs
+        don't hit the recursion limit.
         Returns True if the graph has a cycle, otherwise False.
         :return: bool;
         """
-
-        # Helper function for DFS traversal
-        def dfs_util(node_id, v, s):
-            v[node_id] = True
-            s[node_id] = True
-
-            # Recur for all neighbors
-            for neighbor_id in self.get_node_by_id(node_id).get_children():
-                if not v[neighbor_id]:
-                    if dfs_util(neighbor_id, v, s):
-                        return True
-                elif s[neighbor_id]:
-                    return True
-
-            s[node_id] = False
-            return False
-
-        # Initialize visited and recursion stack
-        visited = {node_id: False for node_id in self.get_node_ids()}
-        stack = {node_id: False for node_id in self.get_node_ids()}
-
-        # Perform DFS for each node in the graph
-        for node_id in self.get_node_ids():
-            if not visited[node_id]:
-                if dfs_util(node_id, visited, stack):
-                    return True
-
-        return False
+        nodes = self.nodes
+        indegree = {node_id: len(node.parents) for node_id, node in nodes.items()}
+        queue = deque(node_id for node_id, d in indegree.items() if d == 0)
+        released = 0
+        while queue:
+            u = queue.popleft()
+            released += 1
+            for v in nodes[u].children:
+                indegree[v] -= 1
+                if indegree[v] == 0:
+                    queue.append(v)
+        return released != len(nodes)
 
     def min_id(self) -> int:
         """
         Returns the minimum index of the graph nodes
         :return: int; minimum index
         """
-        min_index = float('inf')
-        for node in self.get_nodes():
-            if node.id < min_index:
-                min_index = node.id
-        return min_index
+        self._sync()  # A node may have changed its id
+        if self._dirty:
+            self._recompute()
+        return self._min_id
 
     def max_id(self) -> int:
         """
         Returns the maximum index of the graph nodes
         :return: int; maximum index
         """
-        max_index = float('-inf')
-        for node in self.get_nodes():
-            if node.id > max_index:
-                max_index = node.id
-        return max_index
+        self._sync()  # A node may have changed its id
+        if self._dirty:
+            self._recompute()
+        return self._max_id
 
     def shift_indices(self, n: int) -> None:
         """
         Shifts all indices in the graph by adding integer n (possibly negative)
         :param n: int; integer to be added to all indices
         """
-        # Input list
-        new_input = []
-        for i in self.get_input_ids():
-            new_input.append(i + n)
-        self.inputs = new_input
-
-        # Output list
-        new_output = []
-        for i in self.get_output_ids():
-            new_output.append(i + n)
-        self.outputs = new_output
+        # Input and output lists
+        self.inputs = [i + n for i in self.inputs]
+        self.outputs = [i + n for i in self.outputs]
 
-        # ID, parents and children list for each node
-        for node in self.get_nodes():
+        # ID, parents and children list for each node, the nodes are stored under their new id
+        for node in self.nodes.values():
             node.id += n
-
-            # Parents
-            new_parents = {}
-            for i in node.get_parents():
-                new_parents[i + n] = node.parents[i]
-            node.parents = new_parents
-
-            # Children
-            new_children = {}
-            for i in node.get_children():
-                new_children[i + n] = node.children[i]
-            node.children = new_children
-
-    def iparallel(self, g) -> None:
+            node.parents = {i + n: m for i, m in node.parents.items()}
+            node.children = {i + n: m for i, m in node.children.items()}
+        self.nodes = {node.id: node for node in self.nodes.values()}
+
+        # The order of the ids doesn't change, so the CSR form is still valid as it is
+        self._sync()  # Unless a node was changed before
+        csr = self._csr
+        self._invalidate(ids=False)
+        self._csr = csr
+
+        # Every id moves by n, so do the extrema
+        self._min_id += n
+        self._max_id += n
+
+    def _copy_shifted(self, n: int) -> 'OpenDigraph':
+        """
+        Creates a copy of the graph with all its indices shifted by n, same as copy then shift_indices
+        but in a single pass over the nodes
+        :param n: int; integer to be added to all indices (possibly negative)
+        :return: OpenDigraph; the shifted copy
+        """
+        g = OpenDigraph.empty()
+        g.inputs = [i + n for i in self.inputs]
+        g.outputs = [i + n for i in self.outputs]
+        g.nodes = {node.id + n: Node(node.id + n, node.label,
+                                     {i + n: m for i, m in node.parents.items()},
+                                     {i + n: m for i, m in node.children.items()})
+                   for node in self.nodes.values()}
+
+        # Every id moves by n, so do the extrema
+        g._dirty = self._dirty
+        g._min_id = self._min_id + n
+        g._max_id = self._max_id + n
+        return g
+
+    def iparallel(self, g, copy: bool = True) -> None:
         """
         Appends the graph g to self in parallel without modifying g.
+        With copy=False, g is shifted in place and its nodes are moved into self: g must not be used afterwards.
         :param g: OpenDigraph; the graph to be appended in parallel
+        :param copy: bool; if False, skip the copy of g and take ownership of its nodes
         """
-        # Find the maximum index in self and the minimum index in g
-        max_self_index = self.max_id()
-        min_g_index = g.min_id()
-
         # Translate the indices of g by max_self_index - min_g_index + 1
-        m = max_self_index - min_g_index + 1
-        g_copy = g.copy()
-        if m > 0:
-            g_copy.shift_indices(m)
+        m = self.max_id() - g.min_id() + 1
+        if copy:
+            g_copy = g._copy_shifted(max(m, 0))
+        else:
+            g_copy = g
+            if m > 0:
+                g.shift_indices(m)
 
         # Add the nodes and connections of g to self
-        for node in g_copy.get_input_ids():
-            self.inputs.append(node)
-        for node in g_copy.get_output_ids():
-            self.outputs.append(node)
-        for node in g_copy.get_node_ids():
-            self.nodes[node] = g_copy.nodes[node]
+        self.inputs.extend(g_copy.inputs)
+        self.outputs.extend(g_copy.outputs)
+        self.nodes.update(g_copy.nodes)
+        self._invalidate()
 
     def parallel(self, g1, g2) -> None:
         """
@@ -863,31 +1025,17 @@ class OpenDigraph:  # for open directed graph
         :param g1: OpenDigraph; the first graph
         :param g2: OpenDigraph; the second graph
         """
-        # Find the maximum index in self and the minimum index in g
-        max_g1_index = g1.max_id()
-        min_g2_index = g2.min_id()
+        # Translate the indices of g2 by max_g1_index - min_g2_index + 1
+        m = g1.max_id() - g2.min_id() + 1
+        g1_copy = g1._copy_shifted(0)
+        g2_copy = g2._copy_shifted(max(m, 0))
 
-        # Translate the indices of g by max_self_index - min_g_index + 1
-        m = max_g1_index - min_g2_index + 1
-        g2_copy = g2.copy()
-        if m > 0:
-            g2_copy.shift_indices(m)
-
-        # Add the nodes and connections of g1 to the new graph
-        for node in g1.get_input_ids():
-            self.inputs.append(node)
-        for node in g1.get_output_ids():
-            self.outputs.append(node)
-        for node in g1.get_node_ids():
-            self.nodes[node] = g1.nodes[node]
-
-        # Add the nodes and connections of g2 to the new graph
-        for node in g2_copy.get_input_ids():
-            self.inputs.append(node)
-        for node in g2_copy.get_output_ids():
-            self.outputs.append(node)
-        for node in g2_copy.get_node_ids():
-            self.nodes[node] = g2_copy.nodes[node]
+        # Add the nodes and connections of g1 then g2 to the new graph
+        for g in (g1_copy, g2_copy):
+            self.inputs.extend(g.inputs)
+            self.outputs.extend(g.outputs)
+            self.nodes.update(g.nodes)
+        self._invalidate()
 
     def icompose(self, f) -> None:
         """
@@ -899,29 +1047,22 @@ class OpenDigraph:  # for open directed graph
         if len(self.get_input_ids()) != len(f.get_output_ids()):
             raise ValueError("Number of outputs from f doesn't match the number of inputs of self.")
 
-        # Find the maximum index in self and the minimum index in g
-        max_self_index = self.max_id()
-        min_f_index = f.min_id()
-
-        # Translate the indices of g by max_self_index - min_g_index + 1
-        m = max_self_index - min_f_index + 1
-        f_copy = f.copy()
-        if m > 0:
-            f_copy.shift_indices(m)
+        # Translate the indices of f by max_self_index - min_f_index + 1
+        m = self.max_id() - f.min_id() + 1
+        f_copy = f._copy_shifted(max(m, 0))
 
         # Add the nodes of f to self
-        for node in f_copy.get_node_ids():
-            self.nodes[node] = f_copy.nodes[node]
+        nodes = self.nodes
+        nodes.update(f_copy.nodes)
 
         # Connect outputs of f to inputs of self
-        inputs = self.get_input_ids()
-        outputs = f_copy.get_output_ids()
-        for i in range(len(f.outputs)):
-            self.get_node_by_id(inputs[i]).add_parent_id(outputs[i])
-            self.get_node_by_id(outputs[i]).add_child_id(inputs[i])
+        for input_id, output_id in zip(self.inputs, f_copy.outputs):
+            nodes[input_id].add_parent_id(output_id)
+            nodes[output_id].add_child_id(input_id)
 
         # New inputs are inputs of f
-        self.inputs = f_copy.get_input_ids()
+        self.inputs = f_copy.inputs
+        self._invalidate()
 
     def compose(self, f1, f2) -> None:
         """
@@ -933,34 +1074,26 @@ class OpenDigraph:  # for open directed graph
         if len(f1.get_input_ids()) != len(f2.get_output_ids()):
             raise ValueError("Number of outputs from f1 doesn't match the number of inputs of f2.")
 
-        # Find the maximum index in self and the minimum index in g
-        max_f1_index = f1.max_id()
-        min_f2_index = f2.min_id()
+        # Translate the indices of f2 by max_f1_index - min_f2_index + 1
+        m = f1.max_id() - f2.min_id() + 1
+        f1_copy = f1._copy_shifted(0)  # Its nodes get new parents below, f1 must stay untouched
+        f2_copy = f2._copy_shifted(max(m, 0))
 
-        # Translate the indices of g by max_self_index - min_g_index + 1
-        m = max_f1_index - min_f2_index + 1
-        f2_copy = f2.copy()
-        if m > 0:
-            f2_copy.shift_indices(m)
-
-        # Add the nodes of f1 to self
-        for node in f1.get_node_ids():
-            self.nodes[node] = f1.nodes[node]
-        # Add the nodes of f2 to self
-        for node in f2_copy.get_node_ids():
-            self.nodes[node] = f2_copy.nodes[node]
+        # Add the nodes of f1 and f2 to self
+        nodes = self.nodes
+        nodes.update(f1_copy.nodes)
+        nodes.update(f2_copy.nodes)
 
         # Connect outputs of f2 to inputs of f1
-        inputs = f1.get_input_ids()
-        outputs = f2_copy.get_output_ids()
-        for i in range(len(f2.get_output_ids())):
-            self.get_node_by_id(inputs[i]).add_parent_id(outputs[i])
-            self.get_node_by_id(outputs[i]).add_child_id(inputs[i])
+        for input_id, output_id in zip(f1_copy.inputs, f2_copy.outputs):
+            nodes[input_id].add_parent_id(output_id)
+            nodes[output_id].add_child_id(input_id)
 
         # New inputs are inputs of f2
-        self.inputs = f2_copy.get_input_ids()
+        self.inputs = f2_copy.inputs
         # New outputs are outputs of f1
-        self.outputs = f1.get_output_ids()
+        self.outputs = f1_copy.outputs
+        self._invalidate()
 
     @classmethod
     def identity(cls, n: int) -> 'OpenDigraph':
@@ -969,15 +1102,11 @@ class OpenDigraph:  # for open directed graph
         :param n: int; number of children
         :return: OpenDigraph; the idendity over n children graph
         """
-        t = [i for i in range(n)]
-        nodes = [Node(identity=i, label='&', parents={}, children={}) for i in range(n)]
-
-        # Connect each node to itself
-        for i in range(n):
-            nodes[i].add_child_id(i)
-            nodes[i].add_parent_id(i)
+        # Each node is connected to itself
+        nodes = [Node(identity=i, label='&', parents={i: 1}, children={i: 1}) for i in range(n)]
 
-        return cls(inputs=t, outputs=t, nodes=nodes)
+        # Two lists, so that adding an input doesn't add an output
+        return cls(inputs=list(range(n)), outputs=list(range(n)), nodes=nodes)
 
     def connected_components(self) -> Tuple[int, Dict[int, int], List['OpenDigraph']]:
         """
@@ -988,73 +1117,50 @@ class OpenDigraph:  # for open directed graph
                  dictionary mapping node IDs to their connected component number,
                  and a list of OpenDigraph, each corresponding to a component
         """
-        visited = set()
+        # Union-find over the edges of the CSR form, direction doesn't matter for connectivity
+        indptr, indices, _ = self._build_csr()  # Read from the nodes as they are now, not from the cache
+        roots = _components_csr(indptr, indices)
+
+        # Number the components in the order their first node appears in the graph
+        id_to_idx = self.node_id_to_index_map()
+        numbers = {}
         dic = {}
-        cpt = 0
-        nodes = self.get_nodes()
-
-        # Helper function for DFS traversal
-        def dfs_util(node_id):
-            if node_id in visited:
-                return  # Node already visited
-            visited.add(node_id)
-            dic[node_id] = cpt
-
-            # Explore all children of the current node
-            for child_id in nodes[node_id].get_children():
-                dfs_util(child_id)
-
-            # Explore all parents of the current node
-            for parent_id in nodes[node_id].get_parents():
-                dfs_util(parent_id)
-
-        # Start DFS for each node that is still unmarked
-        for node in nodes:
-            if node.get_id() not in visited:
-                dfs_util(node.get_id())
-                cpt += 1
+        for node_id in self.nodes:
+            dic[node_id] = numbers.setdefault(roots[id_to_idx[node_id]], len(numbers))
+        cpt = len(numbers)
+
+        # Group the nodes, inputs and outputs of each component in a single pass each
+        groups = [[] for _ in range(cpt)]
+        for node_id, component in dic.items():
+            groups[component].append(node_id)
+        group_inputs = [[] for _ in range(cpt)]
+        for i in self.inputs:
+            group_inputs[dic[i]].append(i)
+        group_outputs = [[] for _ in range(cpt)]
+        for i in self.outputs:
+            group_outputs[dic[i]].append(i)
 
         # Recreate all components
         res = []
-        components = [i for i in range(cpt)]
-        self_nodes = self.get_nodes()
-
-        for component in components:
-            # Get the nodes of the current component
-            nodes = {i: self_nodes[i] for i in self.get_node_ids() if dic[i] == component}
-
-            # Create new node IDs
-            new_ids = {old_id: new_id for new_id, old_id in enumerate(sorted(nodes.keys()))}
-
-            # Create new inputs and outputs
-            new_inputs = [new_ids[i] for i in self.get_input_ids() if i in nodes]
-            new_outputs = [new_ids[i] for i in self.get_output_ids() if i in nodes]
+        nodes = self.nodes
+        for component in range(cpt):
+            # Create new node IDs, neighbors of a node are always in its component
+            new_ids = {old_id: new_id for new_id, old_id in enumerate(sorted(groups[component]))}
 
             # Create new nodes with news IDs and their respective connections
             new_nodes = []
-            for old_id in nodes:
-                new_id = new_ids[old_id]
-                parents = nodes[old_id].get_parents()
-                children = nodes[old_id].get_children()
-                new_parents = {new_ids[i]: parents[i] for i in parents if i in new_ids}
-                new_children = {new_ids[i]: children[i] for i in children if i in new_ids}
-                new_nodes.append(Node(new_id, nodes[old_id].get_label(), new_parents, new_children))
+            for old_id in groups[component]:
+                node = nodes[old_id]
+                new_parents = {new_ids[i]: m for i, m in node.parents.items()}
+                new_children = {new_ids[i]: m for i, m in node.children.items()}
+                new_nodes.append(Node(new_ids[old_id], node.label, new_parents, new_children))
 
             # Add the new subgraph
-            res.append(OpenDigraph(new_inputs, new_outputs, new_nodes))
+            res.append(OpenDigraph([new_ids[i] for i in group_inputs[component]],
+                                   [new_ids[i] for i in group_outputs[component]], new_nodes))
 
         return cpt, dic, res
 
-    @staticmethod
-    def min_distance(dist, q):
-        min_dist = float('inf')
-        min_node = None
-        for node in q:
-            if dist[node] < min_dist:
-                min_dist = dist[node]
-                min_node = node
-        return min_node
-
     def dijkstra(self, src: int, direction=None, tgt=None) -> Tuple[Dict[int, int], Dict[int, int]]:
         """
         Implements Dijkstra algorithm for the graph,
@@ -1069,51 +1175,73 @@ class OpenDigraph:  # for open directed graph
                  the dictionary mapping each node id to its distance from the source
                  and the one giving the previous node ids in the shortest path
         """
-        # Stocke les noeuds que nous pouvons parcourir, en fonction de la direction
-        q = [src]
+        if direction not in (None, -1, 1):
+            raise ValueError("La direction doit être None, -1 ou 1")
+
+        # Un parcours complet est gardé jusqu'à la prochaine modification du graphe, on en rend des copies.
+        # Les parcours d'une version sont rangés ensemble et jetés d'un coup quand elle change,
+        # au-delà de _DIJKSTRA_CACHE_SIZE le moins récemment utilisé est oublié
+        if tgt is None:
+            self._sync()
+            runs = self._cache.get('dijkstra')
+            if runs is None or runs[0] != self._version:
+                runs = (self._version, OrderedDict())
+                self._cache['dijkstra'] = runs
+            cached = runs[1].get((src, direction))
+            if cached is not None:
+                runs[1].move_to_end((src, direction))
+                return dict(cached[0]), dict(cached[1])
+
+        # Toutes les arêtes ont un poids de 1 : un parcours en largeur suffit
+        nodes = self.nodes
+        q = deque([src])
         dist = {src: 0}
         prev = {}
 
-        # Algorithme de Dijkstra
-        while len(q) > 0:
-            u = self.min_distance(dist, q)
+        while q:
+            u = q.popleft()
 
             if u == tgt:
                 return dist, prev
 
+            node = nodes[u]
+            d = dist[u] + 1
             if direction is None:
-                neighbors = self.get_node_by_id(u).get_children()
-                parents = self.get_node_by_id(u).get_parents()
-                for p in parents:
-                    neighbors[p] = parents[p]
-
+                neighbors = (node.children, node.parents)
             elif direction == -1:
-                neighbors = self.get_node_by_id(u).get_parents()
-
-            elif direction == 1:
-                neighbors = self.get_node_by_id(u).get_children()
-
+                neighbors = (node.parents,)
             else:
-                raise ValueError("La direction doit être None, -1 ou 1")
-
-            for v in neighbors:
-                if v not in dist:
-                    q.append(v)
-                    dist[v] = float('inf')
-                if dist[v] > dist[u] + 1:  # Ne tient pas compte du poids des arêtes
-                    dist[v] = dist[u] + 1
-                    prev[v] = u
-
-            q.remove(u)
-
+                neighbors = (node.children,)
+
+            for adjacency in neighbors:
+                for v in adjacency:
+                    if v not in dist:
+                        dist[v] = d
+                        prev[v] = u
+                        q.append(v)
+
+        if tgt is None:
+            runs[1][(src, direction)] = (dict(dist), dict(prev))
+            if len(runs[1]) > _DIJKSTRA_CACHE_SIZE:
+                runs[1].popitem(last=False)
         return dist, prev
 
     def shortest_path(self, u, v):
+        """
+        Returns the shortest path from u to v, going through parents and children.
+        Raises a ValueError if v can't be reached from u.
+        :param u: int; the id of the source node
+        :param v: int; the id of the target node
+        :return: List[int]; ids of the nodes of the path, from u to v
+        """
         dist, prev = self.dijkstra(u, None, v)
+        if v not in dist:
+            raise ValueError("No path between the two nodes")
         nodes = [v]
         while v != u:
             v = prev[v]
-            nodes.insert(0, v)
+            nodes.append(v)
+        nodes.reverse()
         return nodes
         
     def common_ancestors_distances(self, node1_id: int, node2_id: int) -> Dict[int, Tuple[int, int]]:
@@ -1126,53 +1254,49 @@ class OpenDigraph:  # for open directed graph
                                              as keys and distances from both nodes as values
         """
         # Perform Dijkstra's algorithm from both nodes
-        dist1, prev1 = self.dijkstra(node1_id)
-        dist2, prev2 = self.dijkstra(node2_id)
-
-        # Find common ancestors
-        common_ancestors = set(prev1.keys()) & set(prev2.keys())
+        dist1, _ = self.dijkstra(node1_id)
+        dist2, _ = self.dijkstra(node2_id)
 
-        # Calculate distances from both nodes to common ancestors
-        common_ancestors_distances = {}
-        for ancestor in common_ancestors:
-            distance_from_node1 = dist1[ancestor]
-            distance_from_node2 = dist2[ancestor]
-            common_ancestors_distances[ancestor] = (distance_from_node1, distance_from_node2)
+        # Find common ancestors, a node can be an ancestor of the other (prev has no entry for the source)
+        # Key views are set-like, no intermediate set is built
+        common_ancestors = dist1.keys() & dist2.keys()
 
-        return common_ancestors_distances
+        # Distances from both nodes to each common ancestor
+        return {ancestor: (dist1[ancestor], dist2[ancestor]) for ancestor in common_ancestors}
     
     def topological_sort(self) -> Union[List[Set[int]], str]:
         """
-        Performs a topological sort on the graph and returns a sequence of sets representing the sort.
-        If the graph is cyclic, returns an error message.
+        Performs a topological sort on the graph and returns a sequence of sets representing the sort,
+        the first set holds the nodes without parents. Raises a ValueError if the graph is cyclic.
         :return: Union[List[Set[int]], str]; sequence of sets
         """
-        # Initialize result list
-        topological_sequence = []
+        nodes = self.nodes
+
+        # Kahn's algorithm: a node is released once all its parents are
+        indegree = {node_id: len(node.parents) for node_id, node in nodes.items()}
 
         # Initialize set of nodes with no parents (co-leaves)
-        co_leaves = set(self.get_input_ids())
+        co_leaves = {node_id for node_id, d in indegree.items() if d == 0}
+        topological_sequence = []
+        released = 0
 
-        # Perform topological sort
         while co_leaves:
-            current_set = set()
+            topological_sequence.append(co_leaves)
+            released += len(co_leaves)
 
-            # Find co-leaves
+            # The children whose last parent is in this level make the next one
             new_co_leaves = set()
             for node_id in co_leaves:
-                current_set.add(node_id)
-                for child_id in self.get_node_by_id(node_id).get_children():
-                    if all(parent_id not in current_set for parent_id in self.get_node_by_id(child_id).get_parents()):
+                for child_id in nodes[node_id].children:
+                    indegree[child_id] -= 1
+                    if indegree[child_id] == 0:
                         new_co_leaves.add(child_id)
-
-            # If there are no new co-leaves but the graph is not empty, it's cyclic
-            if not new_co_leaves and len(current_set) < len(self.get_node_ids()):
-                raise ValueError("Graph is cyclic")
-
-            # Add current set to the topological sequence
-            topological_sequence.append(current_set)
             co_leaves = new_co_leaves
 
+        # Nodes on a cycle are never released
+        if released != len(nodes):
+            raise ValueError("Graph is cyclic")
+
         return topological_sequence
     
     def graph_depth(self) -> int:
@@ -1180,11 +1304,18 @@ class OpenDigraph:  # for open directed graph
         Calculates the depth of the graph, which is the number of sets in the topological sort.
         :return: int; depth of the graph
         """
-        topological_sequence = self.topological_sort()
-        if isinstance(topological_sequence, str):
+        try:
+            return len(self.topological_sort())
+        except ValueError:
             return 0  # Graph is cyclic, depth is 0
-        else:
-            return len(topological_sequence)
+
+    def _topological_order(self) -> List[int]:
+        """
+        Returns the node ids level by level, as in the topological sort, in a single flat list.
+        Raises a ValueError if the graph is cyclic.
+        :return: List[int]; node ids in topological order
+        """
+        return [node_id for node_set in self.topological_sort() for node_id in node_set]
 
     @staticmethod
     def node_depth(node_id: int, topological_sort: List[Set[int]]) -> int:
@@ -1199,30 +1330,48 @@ class OpenDigraph:  # for open directed graph
                 return i
         raise ValueError(f"Node {node_id} not found in the provided topological sort.")
 
-    def longest_path(self, u: int, v: int, topological_sort: List[Set[int]]) -> Tuple[int, List[int]]:
+    def longest_path(self, u: int, v: int, topological_sort: List[Set[int]] = None) -> Tuple[int, List[int]]:
         """
         Calculates the longest path from node u to node v in the graph using topological sorting.
         :param u: int; source node
         :param v: int; target node
-        :param topological_sort: List[Set[int]]; result of the topological sort
+        :param topological_sort: List[Set[int]]; result of the topological sort, the one of the graph if None
         :return: Tuple[int, List[int]]; distance of the longest path and longest path itself
         """
-        # Initialize distances and previous nodes
-        dist = {node_id: -float('inf') for node_set in topological_sort for node_id in node_set}
-        prev = {node_id: None for node_set in topological_sort for node_id in node_set}
-
-        # Initialize distance of source node u to 0
-        dist[u] = 0
+        if topological_sort is None:
+            order = self._topological_order()
+        else:
+            order = [node_id for node_set in topological_sort for node_id in node_set]
+        dist, prev = self._dag_longest_distances(u, order, v)
+        if v not in dist:
+            return -float('inf'), [v]  # v can't be reached from u
+        return dist[v], self.reconstruct_path(prev, v)
 
-        # Iterate through topological sort
-        for node_set in topological_sort:
-            for node_id in node_set:
-                if node_id == v:
-                    return dist[v], self.reconstruct_path(prev, v)
-                for parent_id in self.nodes[node_id].get_parents():
-                    if dist[parent_id] + 1 > dist[node_id]:
-                        dist[node_id] = dist[parent_id] + 1
-                        prev[node_id] = parent_id
+    def _dag_longest_distances(self, u: int, order: List[int], tgt: int = None) \
+            -> Tuple[Dict[int, int], Dict[int, int]]:
+        """
+        Longest distances from u in an acyclic graph, each node pushes its distance to its children in topological order.
+        A node's distance is final once it is reached in the order, so the search stops at tgt.
+        :param u: int; source node
+        :param order: List[int]; node ids in topological order (see _topological_order)
+        :param tgt: int; the id of the target node to stop early if found
+        :return: Tuple[Dict[int, int], Dict[int, int]]; distance of each node reachable from u,
+                 and the previous node on its longest path (None for u)
+        """
+        nodes = self.nodes
+        dist = {u: 0}
+        prev = {u: None}
+        for node_id in order:
+            if node_id == tgt:
+                return dist, prev
+            if node_id not in dist:
+                continue  # Not reachable from u
+            d = dist[node_id] + 1
+            for child_id in nodes[node_id].children:
+                if d > dist.get(child_id, -1):
+                    dist[child_id] = d
+                    prev[child_id] = node_id
+        return dist, prev
 
     @staticmethod
     def reconstruct_path(prev: dict, v: int) -> List[int]:
@@ -1235,52 +1384,45 @@ class OpenDigraph:  # for open directed graph
         path = []
         current = v
         while current is not None:
-            path.insert(0, current)
+            path.append(current)
             current = prev[current]
+        path.reverse()
         return path
 
     def max_path_and_distance(self, u: int, v: int) -> Tuple[List[int], int]:
         """
         Calculates the maximum path and distance from node u to node v in the graph.
+        Exact on an acyclic graph (relaxation in topological order), greedy with a max-heap otherwise.
         :param u: int; source node
         :param v: int; target node
         :return: Tuple[List[int], int]; maximum path and distance
         """
-        # Initialize distances and previous nodes
-        dist = {node_id: -float('inf') for node_id in self.nodes}
-        prev = {node_id: None for node_id in self.nodes}
-
-        # Initialize distance of source node u to 0
-        dist[u] = 0
-
-        # Initialize maximum distance encountered and the node that leads to that distance
-        max_distance = -float('inf')
-
-        # Iterate through the graph using Dijkstra's algorithm
-        for _ in range(len(self.nodes)):
-            u = max(dist, key=dist.get)  # Node with maximum distance
-            if u == v:
-                break  # Reached target node v
-            if dist[u] == -float('inf'):
-                break  # Unreachable nodes remaining
-
-            for v in self.nodes[u].get_children():
-                if dist[u] + 1 > dist[v]:
-                    dist[v] = dist[u] + 1
-                    prev[v] = u
-                    if dist[v] > max_distance:
-                        max_distance = dist[v]
-
-            del dist[u]  # Remove processed node from distances
-
-        # Reconstruct the maximum path
-        path = []
-        current = v
-        while current is not None:
-            path.insert(0, current)
-            current = prev[current]
-
-        return path, max_distance
+        if not self.is_cyclic():
+            dist, prev = self._dag_longest_distances(u, self._topological_order(), v)
+        else:
+            # Greedy search on a max-heap, each node is expanded once from its largest known distance
+            nodes = self.nodes
+            dist = {u: 0}
+            prev = {u: None}
+            expanded = set()
+            heap = [(0, u)]
+            while heap:
+                d, w = heappop(heap)
+                d = -d
+                if w in expanded or d < dist[w]:
+                    continue  # Outdated entry
+                if w == v:
+                    break  # Reached target node v
+                expanded.add(w)
+                for child_id in nodes[w].children:
+                    if child_id not in expanded and d + 1 > dist.get(child_id, -1):
+                        dist[child_id] = d + 1
+                        prev[child_id] = w
+                        heappush(heap, (-d - 1, child_id))
+
+        if v not in dist:
+            return [v], -float('inf')  # v can't be reached from u
+        return self.reconstruct_path(prev, v), dist[v]
 
     def merge_nodes(self, node_id1: int, node_id2: int, label: str = None) -> int:
         """
@@ -1310,8 +1452,11 @@ class OpenDigraph:  # for open directed graph
             self.nodes[node_id1].add_parent_id(parent_id)
             self.nodes[parent_id].add_child_id(node_id1)
 
-        # Remove node2 from the graph
-        del self.nodes[node_id2]
+        # Remove node2 from the graph, the extrema only have to be recomputed if it was one of them
+        removed = self.nodes.pop(node_id2)
+        self._invalidate(ids=False)
+        if removed.id == self._min_id or removed.id == self._max_id:
+            self._dirty = True
 
         return node_id1
 
@@ -1340,10 +1485,10 @@ class BoolCirc(OpenDigraph):
         allowed_primitives = {'0', '1', '~', '|', '&', '^'}
 
         # Check each node validity
-        for node in self.g.get_nodes():
-            label = node.get_label()
+        for node in self.g.nodes.values():
+            label = node.label
             if label == '':
-                if node.indegree() != 1:
+                if len(node.parents) != 1:
                     return False
             elif label not in allowed_primitives:
                 return False  # Unknown type of node
@@ -1397,35 +1542,58 @@ class BoolCirc(OpenDigraph):
         :param s: str; the propositional formula in infix notation
         :return: Tuple[BoolCirc, List[str]]; the boolean circuit and list of variable names
         """
-        current_node_id = self.max_id() + 1  # Start with a new node ID
-        parent_node_id = self.max_id() + 2
+        start = self._next_id()  # Start with a new node
+        return self._instantiate_parsed(BoolCirc._parse_formula(s), start)
+
+    @staticmethod
+    @lru_cache(maxsize=256)
+    def _parse_formula(s: str) -> Tuple[tuple, Tuple[str, ...]]:
+        """
+        Reads a formula for parse_parentheses in a graph of its own, the result is immutable so that it can be
+        kept for the next calls with the same formula (the 256 last ones)
+        :param s: str; the propositional formula in infix notation
+        :return: Tuple[tuple, Tuple[str, ...]]; nodes relative to the first one (offset, label, parents, children)
+                 and variable names
+        """
+        g = OpenDigraph.empty()
+        nodes = g.nodes
+        current_node_id = 0
+        nodes[current_node_id] = Node(identity=current_node_id, label='', parents={}, children={})
+        next_id = current_node_id + 1  # New nodes take the following ids, max_id isn't called again
+        parent_node_id = next_id
+        letters = _LETTERS
         s2 = ''
         variables = []
+        seen = set()  # Same names as variables, for O(1) membership
 
         for char in s:
             if char == '(':
                 # Add s2 to the label of the current node
-                self.nodes[current_node_id].label += s2
+                nodes[current_node_id].label += s2
 
                 # Create a parent of current_node and make it current_node
-                parent_node_id = self.max_id() + 1
-                self.nodes[parent_node_id] = Node(identity=parent_node_id, label='', parents={}, children={})
-                self.nodes[parent_node_id].add_child_id(current_node_id)
-                self.nodes[current_node_id].add_parent_id(parent_node_id)
+                parent_node_id = next_id
+                next_id += 1
+                nodes[parent_node_id] = Node(identity=parent_node_id, label='', parents={}, children={})
+                nodes[parent_node_id].add_child_id(current_node_id)
+                nodes[current_node_id].add_parent_id(parent_node_id)
                 current_node_id = parent_node_id
                 s2 = ''
 
             elif char == ')':
                 # Add s2 to the label of current_node
-                self.nodes[current_node_id].label += s2
+                nodes[current_node_id].label += s2
 
                 # Change current_node so that it becomes its child
-                current_node_id = list(self.nodes[current_node_id].parents)[0]
+                current_node_id = next(iter(nodes[current_node_id].parents), None)
+                if current_node_id is None:
+                    raise ValueError("Unbalanced parentheses")
                 s2 = ''
 
-            elif char.isalpha():
+            elif char in letters:
                 # Add char to variables if it's not already there
-                if char not in variables:
+                if char not in seen:
+                    seen.add(char)
                     variables.append(char)
 
                 # Add char to the end of s2
@@ -1434,16 +1602,37 @@ class BoolCirc(OpenDigraph):
             elif char == ' ':
                 # Merge nodes if s2 represents a variable
                 if s2.isalpha():
-                    self.merge_nodes(parent_node_id, current_node_id)
-                    current_node_id = list(self.nodes[parent_node_id].parents)[0]
+                    g.merge_nodes(parent_node_id, current_node_id)
+                    current_node_id = next(iter(nodes[parent_node_id].parents), None)
+                    if current_node_id is None:
+                        raise ValueError("Unbalanced parentheses")
                     s2 = ''
                 else:
                     s2 += char
 
         # Add the remaining characters in s2 to the label of the current node
-        self.nodes[current_node_id].label += s2
+        nodes[current_node_id].label += s2
 
-        return self, variables
+        return (tuple((node_id, node.label, tuple(node.parents.items()), tuple(node.children.items()))
+                      for node_id, node in sorted(nodes.items())),
+                tuple(variables))
+
+    def _instantiate_parsed(self, parsed: Tuple[tuple, Tuple[str, ...]], start: int) -> Tuple['BoolCirc', List[str]]:
+        """
+        Adds to the circuit the nodes of a formula already read by parse_parentheses, without reading it again
+        :param parsed: Tuple[tuple, Tuple[str, ...]]; result of _parse_formula, nodes relative to the first one
+                       (offset, label, parents, children) and variable names
+        :param start: int; id given to the first node of the formula
+        :return: Tuple[BoolCirc, List[str]]; the boolean circuit and list of variable names
+        """
+        nodes = self.nodes
+        relative_nodes, variables = parsed
+        for offset, label, parents, children in relative_nodes:
+            node_id = start + offset
+            nodes[node_id] = Node(node_id, label, {start + p: m for p, m in parents},
+                                  {start + c: m for c, m in children})
+        self._invalidate()  # The maximum is recomputed on demand
+        return self, list(variables)
 
     @staticmethod
     def parse_parentheses_multiple(*args: str) -> 'BoolCirc':
@@ -1464,13 +1653,14 @@ class BoolCirc(OpenDigraph):
         # Combine circuits side by side
         for circuit in circuits:
             # Connect the outputs of the current circuit to the inputs of the merged circuit
-            output_id = list(circuit.nodes.keys())[-1]  # Get the output node ID of the current circuit
-            input_id = merged_circuit.max_id() + 1  # Get the next available ID in the merged circuit
+            output_id = next(reversed(circuit.nodes))  # Get the output node ID of the current circuit, no key list
+            input_id = merged_circuit._next_id()  # Get the next available ID in the merged circuit
 
             # Add the output node of the current circuit as a child of the input node of the merged circuit
             merged_circuit.nodes[input_id] = Node(identity=input_id, label='', parents={}, children={})
             merged_circuit.nodes[input_id].add_child_id(output_id)
             merged_circuit.nodes[output_id].add_parent_id(input_id)
+            merged_circuit._invalidate(ids=False)
 
         return merged_circuit
 
@@ -1483,13 +1673,15 @@ class BoolCirc(OpenDigraph):
         :param outputs: int; number of outputs
         """
         # Label the nodes based on their in-degree and out-degree
-        for node in self.g.get_node_ids():
-            indegree = self.g.get_node_by_id(node).indegree()
-            outdegree = self.g.get_node_by_id(node).outdegree()
+        g = self.g
+        g_nodes = g.nodes
+        for node, n in list(g_nodes.items()):  # Snapshot, split nodes add new ones
+            indegree = n.indegree()
+            outdegree = n.outdegree()
 
             if indegree == outdegree == 1:
                 # Assign unary operator
-                self.g.get_node_by_id(node).set_label(choice(unary_operators))
+                n.set_label(choice(unary_operators))
 
             elif indegree == 1 and outdegree > 1:
                 # Do nothing, node represents a copy
@@ -1497,38 +1689,32 @@ class BoolCirc(OpenDigraph):
 
             elif indegree > 1 and outdegree == 1:
                 # Assign binary operator
-                self.g.get_node_by_id(node).set_label(choice(binary_operators))
+                n.set_label(choice(binary_operators))
 
             elif indegree > 1 and outdegree > 1:
-                # Split the node into two nodes
-                new_node1 = len(self.g.get_nodes())
-                new_node2 = len(self.g.get_nodes()) + 1
-                self.g.get_node_by_id(new_node1).set_label(choice(binary_operators))
-                self.g.get_node_by_id(new_node2).set_label("")
-
-                for parent in self.g.get_node_ids():
-                    self.g.get_node_by_id(parent).remove_parent_id(node)
-                    self.g.get_node_by_id(parent).add_parent_id(new_node1)
-
-                for child in self.g.get_node_ids():
-                    self.g.get_node_by_id(child).remove_child_id(node)
-                    self.g.get_node_by_id(new_node2).add_child_id(child)
-
-                self.g.get_node_by_id(new_node2).set_label("")
+                # Split the node into two nodes: the node keeps its parents and gets a binary operator,
+                # a new copy node takes its children
+                copy_id = g._next_id()
+                g_nodes[copy_id] = Node(copy_id, "", {node: 1}, n.children)
+                for child_id in n.children:  # Only the real neighbors are touched
+                    child_parents = g_nodes[child_id].parents
+                    child_parents[copy_id] = child_parents.pop(node)
+                n.children = {copy_id: 1}
+                n.set_label(choice(binary_operators))
+        g._invalidate(ids=False)
 
         # Add inputs and outputs if necessary
-        node_ids = self.get_node_ids()
-        inputs_list = [i for i in node_ids if len(self.g.get_node_by_id(i).get_parents()) == 0 and
-                       len(self.g.get_node_by_id(i).get_children()) == 1]
+        inputs_list = [i for i, n in g_nodes.items() if len(n.parents) == 0 and len(n.children) == 1]
         if len(inputs_list) < inputs:
             raise ValueError("This graph has too few possibilities for inputs nodes")
-        inputs_list = sample(node_ids, inputs)
+        inputs_list = sample(inputs_list, inputs)
 
-        outputs_list = [i for i in node_ids if len(self.g.get_node_by_id(i).get_children()) == 0 and
-                        len(self.g.get_node_by_id(i).get_parents()) == 1 and i not in inputs_list]
+        chosen = set(inputs_list)
+        outputs_list = [i for i, n in g_nodes.items() if len(n.children) == 0 and
+                        len(n.parents) == 1 and i not in chosen]
         if len(outputs_list) < outputs:
             raise ValueError("This graph has too few possibilities for outputs nodes")
-        outputs_list = sample(node_ids, outputs)
+        outputs_list = sample(outputs_list, outputs)
 
         for node_id in inputs_list:
             self.g.add_input_id(node_id)
@@ -1573,8 +1759,8 @@ class BoolCirc(OpenDigraph):
         Constructs a Carry-Lookahead Adder for registers of size 4n.
         :param n: int; size of the register 4n
         """
-        if not n % 4 and n > 0:
-            raise ValueError("n must be a multiple of 4")
+        if n < 0:
+            raise ValueError("n must be a non-negative integer")
 
         if n == 0:
             # Base case: Constructing the Adder for a register of size 1
@@ -1590,188 +1776,420 @@ class BoolCirc(OpenDigraph):
         :param number: int; the integer value to be represented.
         :param register_size: int; the size of the register (number of bits). Default is 8
         """
-        # Convert the integer to binary representation
-        binary_str = bin(number)[2:]
+        if number < 0:
+            raise ValueError("The number must be non-negative")
+
+        # The integer itself holds the bits, the most significant one comes first.
+        # The register is widened if the number doesn't fit, 0 still takes one bit
+        width = max(register_size, number.bit_length(), 1)
+
+        # The nodes of the chain take consecutive ids and are built with their edges, the graph is updated once
+        g = self.g
+        nodes = g.nodes
+        start = g.new_id()
+        last = start + width - 1
+        for i in range(width):
+            node_id = start + i
+            bit = (number >> (width - 1 - i)) & 1
+            nodes[node_id] = Node(node_id, '1' if bit else '0',
+                                  {node_id - 1: 1} if node_id > start else {},
+                                  {node_id + 1: 1} if node_id < last else {})
+        g._invalidate()
+
+    def _rule_not_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for a NOT gate: ~0 -> 1, ~1 -> 0
+        :param node_id: int; id of the gate
+        :return: bool; True if the gate was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        if len(node.parents) != 1:
+            return False
+        pred_label = nodes[next(iter(node.parents))].label
+        if pred_label == '0':
+            node.label = '1'
+        elif pred_label == '1':
+            node.label = '0'
+        else:
+            return False
+        self.g.remove_all_incoming(node_id)
+        return True
 
-        # Pad the binary string with leading zeros if necessary
-        padded_binary_str = binary_str.zfill(register_size)
+    def _rule_and_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for an AND gate: 0 & x -> 0, x & 0 -> 0, 1 & x -> x, x & 1 -> x
+        :param node_id: int; id of the gate
+        :return: bool; True if the gate was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        absorbed = False
+        neutral_seen = False
+        survivor = None  # First input left once a '1' is taken away
+        for pred in node.parents:
+            label = nodes[pred].label
+            if label == '0':
+                absorbed = True
+                break  # The other inputs don't matter
+            if label == '1' and not neutral_seen:
+                neutral_seen = True
+            elif survivor is None:
+                survivor = label
+        if absorbed:
+            node.label = '0'
+        elif neutral_seen:
+            node.label = '1' if survivor is None else survivor
+        else:
+            return False
+        self.g.remove_all_incoming(node_id)
+        return True
+
+    def _rule_or_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for an OR gate: 0 | x -> x, x | 0 -> x, 1 | x -> 1, x | 1 -> 1
+        :param node_id: int; id of the gate
+        :return: bool; True if the gate was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        absorbed = False
+        neutral_seen = False
+        survivor = None  # First input left once a '0' is taken away
+        for pred in node.parents:
+            label = nodes[pred].label
+            if label == '1':
+                absorbed = True
+                break  # The other inputs don't matter
+            if label == '0' and not neutral_seen:
+                neutral_seen = True
+            elif survivor is None:
+                survivor = label
+        if absorbed:
+            node.label = '1'
+        elif neutral_seen:
+            node.label = '0' if survivor is None else survivor
+        else:
+            return False
+        self.g.remove_all_incoming(node_id)
+        return True
 
-        # Create nodes for each bit of the binary representation
-        for bit in padded_binary_str:
-            self.g.add_node(bit)
+    def _rule_xor_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for a XOR gate: 0 ˆ x -> x, x ˆ 0 -> x, 1 ˆ x -> ~x, x ˆ 1 -> ~x
+        :param node_id: int; id of the gate
+        :return: bool; True if the gate was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        zero_seen = one_seen = False
+        zero_survivor = one_survivor = None  # First input left once a '0' (a '1') is taken away
+        for pred in node.parents:
+            label = nodes[pred].label
+            if label == '0' and not zero_seen:
+                zero_seen = True
+            elif zero_survivor is None:
+                zero_survivor = label
+            if label == '1' and not one_seen:
+                one_seen = True
+            elif one_survivor is None:
+                one_survivor = label
+            if zero_seen and zero_survivor is not None:
+                break  # The '0' rule applies and its result is known
+        if zero_seen:
+            node.label = '0' if zero_survivor is None else zero_survivor
+        elif one_seen:
+            node.label = '1' if one_survivor is None else '∼' + one_survivor
+        else:
+            return False
+        self.g.remove_all_incoming(node_id)
+        return True
 
-        # Connect the nodes in the circuit to represent the binary value
-        for i in range(register_size - 1):
-            self.g.add_edge(int(padded_binary_str[i]), int(padded_binary_str[i + 1]))
+    def _negates(self, neg: int, x: int) -> bool:
+        """
+        Tells whether a node is the negation of another one, either as a NOT gate whose single input is the other
+        node, or through the labels, like '∼x' and 'x' as left by the XOR rule
+        :param neg: int; id of the node that may be the negation
+        :param x: int; id of the other node
+        :return: bool; True if neg is ~x
+        """
+        nodes = self.g.nodes
+        neg_node = nodes[neg]
+        neg_label = neg_node.label
+        if neg_label in ('∼', '~'):
+            return len(neg_node.parents) == 1 and x in neg_node.parents
+        x_label = nodes[x].label  # Compared in place, no '∼' + x string is built
+        return len(neg_label) == len(x_label) + 1 and neg_label[0] == '∼' and neg_label.endswith(x_label)
+
+    def _rule_neutral_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for neutral elements in an OR gate: x | ~x -> 1, ~x | x -> 1
+        :param node_id: int; id of the gate
+        :return: bool; True if the gate was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        if len(node.parents) != 2:
+            return False
+        p0, p1 = node.parents
+        if not (self._negates(p0, p1) or self._negates(p1, p0)):
+            return False
+        node.label = '1'
+        self.g.remove_all_incoming(node_id)
+        return True
+
+    def _rule_copy_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for copying without output: x -> x, x | x -> x
+        :param node_id: int; id of the node
+        :return: bool; True if the node was rewritten
+        """
+        nodes = self.g.nodes
+        node = nodes[node_id]
+        if len(node.parents) != 1 or node.children:
+            return False
+        node.label = nodes[next(iter(node.parents))].label
+        self.g.remove_all_incoming(node_id)
+        return True
+
+    def _rule_erase_at(self, node_id: int) -> bool:
+        """
+        Applies transformation for erasing a node with a unary operator, its parent is linked to its child.
+        :param node_id: int; id of the node
+        :return: bool; True if the node was erased
+        """
+        node = self.g.nodes[node_id]
+        if len(node.parents) != 1 or len(node.children) != 1:
+            return False
+        pred = next(iter(node.parents))
+        child = next(iter(node.children))
+        self.g.remove_id(node_id)
+        self.g.add_edge(pred, child)
+        return True
+
+    def _constant_fold(self, order: List[int] = None) -> int:
+        """
+        Evaluates, in a single pass in topological order, every node whose inputs are all constants ('0' or '1'),
+        so that whole constant subcircuits collapse at once. Bits are combined with the integer operators.
+        Nodes directly connected to an output are left as they are, like in evaluate.
+        :param order: List[int]; node ids in topological order, computed if None
+        :return: int; number of nodes replaced by a constant
+        """
+        nodes = self.g.nodes
+        if order is None:
+            try:
+                order = self.g._topological_order()
+            except ValueError:
+                return 0  # Cyclic circuit, nothing to fold
+
+        folded = 0
+        for node_id in order:
+            node = nodes[node_id]
+            if not node.parents or not node.children:
+                continue
+            label = node.label
+            bits = []  # (bit, multiplicity) of each input
+            for pred, m in node.parents.items():
+                pred_label = nodes[pred].label
+                if pred_label == '1':
+                    bits.append((1, m))
+                elif pred_label == '0':
+                    bits.append((0, m))
+                else:
+                    break  # Not a constant
+            else:
+                if label == '&':
+                    value = 1
+                    for bit, _ in bits:
+                        value &= bit
+                elif label == '|':
+                    value = 0
+                    for bit, _ in bits:
+                        value |= bit
+                elif label in ('^', 'ˆ'):
+                    value = 0
+                    for bit, m in bits:
+                        value ^= bit & m  # An input counted twice cancels itself
+                elif label in ('~', '∼') and bits == [(bits[0][0], 1)]:
+                    value = ~bits[0][0] & 1
+                elif label == '' and bits == [(bits[0][0], 1)]:
+                    value = bits[0][0]  # Copy of a constant
+                else:
+                    continue
+
+                node.label = '1' if value else '0'
+                for pred in node.parents:
+                    nodes[pred].children.pop(node_id, None)
+                node.parents = {}
+                folded += 1
+
+        if folded:
+            self.g._invalidate(ids=False)  # Once for the whole pass
+        return folded
 
     def rule_not(self) -> None:
         """
         Applies transformation for NOT gates: ~0 -> 1, ~1 -> 0
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == '∼':
-                pred = node.get_parents()[0]
-                pred_label = self.g.nodes[pred].get_label()
-                if pred_label == '0':
-                    self.g.nodes[node_id].set_label('1')
-                elif pred_label == '1':
-                    self.g.nodes[node_id].set_label('0')
-                self.g.remove_edge(pred, node_id)
+        rule = self._rule_not_at
+        for node_id, node in self.g.nodes.items():
+            if node.label in ('∼', '~'):
+                rule(node_id)
 
     def rule_and(self) -> None:
         """
         Applies transformation for AND gates: 0 & x -> 0, x & 0 -> 0, 1 & x -> x, x & 1 -> x
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == '&':
-                inputs = [self.g.nodes[n].get_label() for n in node.get_parents()]
-                if '0' in inputs:
-                    self.g.nodes[node_id].set_label('0')
-                elif '1' in inputs:
-                    inputs.remove('1')
-                    self.g.nodes[node_id].set_label(inputs[0])
-                for pred in node.get_parents():
-                    self.g.remove_edge(pred, node_id)
+        rule = self._rule_and_at
+        for node_id, node in self.g.nodes.items():
+            if node.label == '&':
+                rule(node_id)
 
     def rule_or(self) -> None:
         """
         Applies transformation for OR gates: 0 | x -> x, x | 0 -> x, 1 | x -> 1, x | 1 -> 1
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == '|':
-                inputs = [self.g.nodes[n].get_label() for n in node.get_parents()]
-                if '1' in inputs:
-                    self.g.nodes[node_id].set_label('1')
-                elif '0' in inputs:
-                    inputs.remove('0')
-                    self.g.nodes[node_id].set_label(inputs[0])
-                for pred in node.get_parents():
-                    self.g.remove_edge(pred, node_id)
+        rule = self._rule_or_at
+        for node_id, node in self.g.nodes.items():
+            if node.label == '|':
+                rule(node_id)
 
     def rule_xor(self) -> None:
         """
         Applies transformation for XOR gates and neutral elements: 0 ˆ x -> x, x ˆ 0 -> x, 1 ˆ x -> ~x, x ˆ 1 -> ~x
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == 'ˆ':
-                inputs = [self.g.nodes[n].get_label() for n in node.get_parents()]
-                if '0' in inputs:
-                    inputs.remove('0')
-                    self.g.nodes[node_id].set_label(inputs[0])
-                elif '1' in inputs:
-                    inputs.remove('1')
-                    self.g.nodes[node_id].set_label('∼' + inputs[0])
-                for pred in node.get_parents():
-                    self.g.remove_edge(pred, node_id)
+        rule = self._rule_xor_at
+        for node_id, node in self.g.nodes.items():
+            if node.label in ('ˆ', '^'):
+                rule(node_id)
 
     def evaluate_rule_neutral(self) -> None:
         """
         Applies transformation for neutral elements in OR gates: x | ~x -> 1, ~x | x -> 1
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == '|':
-                inputs = [self.g.nodes[n].get_label() for n in node.get_parents()]
-                if len(inputs) == 2 and '∼' + inputs[0] == inputs[1]:
-                    self.g.nodes[node_id].set_label('1')
-                elif len(inputs) == 2 and '∼' + inputs[1] == inputs[0]:
-                    self.g.nodes[node_id].set_label('1')
-                for pred in node.get_parents():
-                    self.g.remove_edge(pred, node_id)
+        rule = self._rule_neutral_at
+        for node_id, node in self.g.nodes.items():
+            if node.label == '|':
+                rule(node_id)
 
     def rule_copy(self) -> None:
         """
         Applies transformation for copying without output: x -> x, x | x -> x
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.indegree() == 1 and node.outdegree() == 0:
-                pred = node.get_parents()[0]
-                self.g.nodes[node_id].set_label(self.g.nodes[pred].get_label())
-                self.g.remove_edge(pred, node_id)
+        for node_id in self.g.nodes:
+            self._rule_copy_at(node_id)
 
     def rule_erase(self) -> None:
         """
         Applies transformation for erasing a node with a unary operator.
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.indegree() == 1 and node.outdegree() == 1:
-                pred = node.get_parents()[0]
-                self.g.add_edge(pred, node.get_parents()[0])
-                self.g.remove_id(node_id)
+        rule = self._rule_erase_at
+        for node_id in list(self.g.nodes):  # Snapshot, nodes are removed below, only the erased one each time
+            rule(node_id)
 
     def rule_involution(self) -> None:
         """
         Applies transformation for involution of XOR gates with more than two inputs.
         """
-        node_ids = self.g.get_node_ids()
-        for node_id in node_ids:
-            node = self.g.nodes[node_id]
-            if node.get_label() == 'ˆ' and node.indegree() > 2:
-                inputs = [self.g.nodes[n] for n in node.get_parents()]
-                even_inputs = inputs[::2]
-                odd_inputs = inputs[1::2]
-                for i in range(len(even_inputs)):
-                    self.g.add_node('ˆ')
-                    self.g.add_edge(even_inputs[i].get_id(), len(self.g.nodes) - 1)
-                    self.g.add_edge(odd_inputs[i].get_id(), len(self.g.nodes) - 1)
-                    if i == len(even_inputs) - 1 and len(odd_inputs) > len(even_inputs):
-                        self.g.add_edge(odd_inputs[-1].get_id(), len(self.g.nodes) - 1)
+        nodes = self.g.nodes
+        add_node = self.g.add_node
+        add_edge = self.g.add_edge
+        # Snapshot of the wide XOR gates alone, nodes are added below but the parents of these gates don't change
+        gates = [node for node in nodes.values() if node.label == 'ˆ' and len(node.parents) > 2]
+        for node in gates:
+            inputs = list(node.parents)
+            even_inputs = inputs[::2]
+            odd_inputs = inputs[1::2]
+            for even, odd in zip(even_inputs, odd_inputs):
+                new_id = add_node('ˆ')  # The real id, ids may have holes or start above 0
+                add_edge(even, new_id)
+                add_edge(odd, new_id)
+            if len(even_inputs) > len(odd_inputs):
+                add_edge(even_inputs[-1], new_id)  # Odd number of inputs, the last one joins the last pair
 
     def evaluate(self):
         """
-        Applies transformation rules iteratively until there are no more transformations to apply.
-        """
-        # Set to keep track of nodes directly connected to an output
-        output_nodes: Set[int] = set()
-        for node_id in self.g.get_node_ids():
-            if self.g.nodes[node_id].outdegree() == 0:
-                output_nodes.add(node_id)
-
-        # Loop until there are no more transformations to apply
-        transformed = True
-        while transformed:
-            transformed = False  # Flag to check if any transformation was applied in the current iteration
-            # Loop through each node
-            for node_id in list(self.g.get_node_ids()):
-                node = self.g.nodes[node_id]
-
-                # Check if the node is a co-leaf (not directly connected to an output)
-                if node_id not in output_nodes:
-                    # Apply transformation rules
-                    if node.get_label() == '∼':
-                        self.rule_not()
-                        transformed = True
-                    elif node.get_label() == '&':
-                        self.rule_and()
-                        transformed = True
-                    elif node.get_label() == '|':
-                        self.rule_or()
-                        transformed = True
-                    elif node.get_label() == 'ˆ':
-                        self.rule_xor()
-                        transformed = True
-                    elif node.indegree() == 1 and node.outdegree() == 0:
-                        self.rule_copy()
-                        transformed = True
-                    elif node.indegree() == 1 and node.outdegree() == 1:
-                        self.rule_erase()
-                        transformed = True
-                    elif node.get_label() == 'ˆ' and node.indegree() > 2:
-                        self.rule_involution()
-                        transformed = True
+        Applies transformation rules until there are no more transformations to apply.
+        A worklist holds the nodes to look at, a node is only looked at again when one of its neighbors was rewritten.
+        Every rewrite removes at least one edge, so the worklist always runs out.
+        """
+        nodes = self.g.nodes
+
+        # Nodes directly connected to an output are left as they are
+        output_nodes = {node_id for node_id, node in nodes.items() if not node.children}
+
+        # Parents are looked at before their children, so that constants travel down in a single pass.
+        # Folding only removes edges, so the order stays valid for the worklist below
+        try:
+            order = self.g._topological_order()
+        except ValueError:
+            order = None  # Cyclic circuit
+
+        # Constant subcircuits are evaluated at once, the rules only see what remains
+        if order is not None:
+            self._constant_fold(order)
+
+        # Rule for each gate label, the other nodes are handled according to their degrees
+        gate_rules = {'∼': self._rule_not_at, '~': self._rule_not_at, '&': self._rule_and_at,
+                      '|': self._rule_or_at, 'ˆ': self._rule_xor_at, '^': self._rule_xor_at}
+        copy_rule = self._rule_copy_at
+        erase_rule = self._rule_erase_at
+
+        # A gate can only be rewritten if one of its inputs is a constant, the other nodes only depend on their degrees.
+        # Any other node only becomes rewritable when one of its neighbors is rewritten, there is nothing to do
+        # without any candidate
+        constants = ('0', '1')
+        candidates = set()
+        for node_id, node in nodes.items():
+            if node_id in output_nodes:
+                continue
+            if node.label in gate_rules:
+                if any(nodes[pred].label in constants for pred in node.parents):
+                    candidates.add(node_id)
+            elif len(node.parents) == 1 and len(node.children) <= 1:
+                candidates.add(node_id)
+        if not candidates:
+            return
+
+        # Every node keeps its place in the worklist, so the rules are applied in the same order as when all of them
+        # are looked at. A node that isn't a candidate and whose neighbors weren't rewritten is skipped, it's
+        # unchanged since the start and no rule applies to it
+        if order is None:
+            order = list(nodes)
+        work = deque(node_id for node_id in order if node_id not in output_nodes)
+        in_work = set(work)
+        touched = candidates
+        while work:
+            node_id = work.popleft()
+            in_work.discard(node_id)
+            if node_id not in touched:
+                continue
+            node = nodes.get(node_id)
+            if node is None:
+                continue  # Erased in the meantime
+
+            rule = gate_rules.get(node.label)
+            if rule is None:
+                indegree = len(node.parents)  # Read once, not through indegree()/outdegree()
+                outdegree = len(node.children)
+                if indegree != 1:
+                    continue
+                if outdegree == 0:
+                    rule = copy_rule
+                elif outdegree == 1:
+                    rule = erase_rule
+                else:
+                    continue
+
+            # The neighbors are taken before the rewrite, which may unlink them
+            neighbors = [node_id, *node.parents, *node.children]
+            if rule(node_id):
+                for neighbor in neighbors:
+                    if neighbor in nodes and neighbor not in output_nodes:
+                        touched.add(neighbor)
+                        if neighbor not in in_work:
+                            work.append(neighbor)
+                            in_work.add(neighbor)
 
     def hamming_encoder(self):
         """
@@ -1797,14 +2215,9 @@ def random_int_list(n: int, bound: int, unique=False) -> List[int]:
     """
     if unique and n > bound + 1:
         raise ValueError("Bound too small compared to n")
-    res = []
-    for _ in range(n):
-        tmp = randint(0, bound)
-        if unique:
-            while tmp in res:  # All numbers must be different to be IDs
-                tmp = randint(0, bound)
-        res.append(tmp)
-    return res
+    if unique:
+        return sample(range(bound + 1), n)  # All numbers must be different to be IDs, no redraws
+    return [randint(0, bound) for _ in range(n)]
 
 
 def random_int_matrix(n: int, bound: int, unique=False, null_diag=True, symmetric=False,
@@ -1823,29 +2236,25 @@ def random_int_matrix(n: int, bound: int, unique=False, null_diag=True, symmetri
     if symmetric and (oriented or dag):
         raise ValueError("Matrix cannot be symmetric and oriented/acyclic")
 
-    res = []
-    for _ in range(n):
-        res.append(random_int_list(n, bound, unique))
+    res = [random_int_list(n, bound, unique) for _ in range(n)]
 
     if null_diag:
         for i in range(n):
             res[i][i] = 0
 
-    if symmetric:
-        for i in range(n):
-            for j in range(i+1, n):
-                res[j][i] = res[i][j]
-
-    if oriented:
-        for i in range(n):
-            for j in range(i+1, n):
-                if res[i][j] > 0:
-                    res[j][i] = 0
-
+    # A single pass over the rows, the part of row j under the diagonal is rewritten at once from column j.
+    # Only the parts above the diagonal are read, they are never written, so one transpose made by zip is enough
     if dag:
-        for i in range(n):
-            for j in range(i+1, n):
-                res[j][i] = 0
+        for j in range(1, n):
+            res[j][:j] = [0] * j
+    elif symmetric or oriented:
+        columns = list(zip(*res))
+        for j in range(1, n):
+            row = res[j]
+            if symmetric:
+                row[:j] = columns[j][:j]
+            else:  # oriented
+                row[:j] = [0 if up > 0 else low for up, low in zip(columns[j][:j], row)]
 
     return res
 
@@ -1857,39 +2266,108 @@ def graph_from_adjacency_matrix(matrix: List[List[int]]) -> OpenDigraph:
     :return: OpenDigraph; an OpenDigraph made from the matrix
     """
     n = len(matrix)
-    nodes = []
-    for identity in range(n):
-        children = {}
-        parents = {}
-        for i in range(n):
-            if len(matrix[i]) != n or len(matrix[identity]) != n:
-                raise ValueError("The matrix is not a squared matrix")
+    if any(len(row) != n for row in matrix):
+        raise ValueError("The matrix is not a squared matrix")
 
-            if matrix[identity][i]:
-                children[i] = matrix[identity][i]
+    # Only the non-zero cells are kept, read once in row order
+    rows, cols, vals = [], [], []
+    for r, row in enumerate(matrix):
+        for c, v in enumerate(row):
+            if v:
+                rows.append(r)
+                cols.append(c)
+                vals.append(v)
 
-            if matrix[i][identity]:
-                parents[i] = matrix[i][identity]
+    return _graph_from_edges(n, rows, cols, vals)
 
-        node = Node(identity, str(identity), parents, children)
-        nodes.append(node)
 
+def _random_edges(n: int, bound: int, form: str) -> Tuple[List[int], List[int], List[int]]:
+    """
+    Draws the non-zero cells of a random nxn adjacency matrix with a null diagonal, with the same distribution
+    as the matrices given by random_int_matrix, but without building the matrix
+    :param n: int; numbers of rows and columns
+    :param bound: int; maximum value of the integers
+    :param form: str; form of the graph, as in OpenDigraph.random
+    :return: Tuple[List[int], List[int], List[int]]; rows, columns and values of the non-zero cells
+    """
+    rows, cols, vals = [], [], []
+    symmetric = form in ("undirected", "loop-free_undirected")
+
+    # Each pair of opposite cells is drawn at once
+    for i in range(n):
+        for j in range(i + 1, n):
+            upper = randint(0, bound)
+            if upper:
+                rows.append(i)
+                cols.append(j)
+                vals.append(upper)
+
+            if symmetric:
+                lower = upper
+            elif form == "DAG" or (form == "oriented" and upper):
+                lower = 0
+            else:
+                lower = randint(0, bound)
+            if lower:
+                rows.append(j)
+                cols.append(i)
+                vals.append(lower)
+
+    return rows, cols, vals
+
+
+def _graph_from_edges(n: int, rows: List[int], cols: List[int], vals: List[int]) -> OpenDigraph:
+    """
+    Returns an OpenDigraph with n nodes from the non-zero cells of its adjacency matrix
+    :param n: int; number of nodes
+    :param rows: List[int]; source of each edge
+    :param cols: List[int]; target of each edge
+    :param vals: List[int]; multiplicity of each edge
+    :return: OpenDigraph; an OpenDigraph made from the edges
+    """
+    nodes = [Node(identity, str(identity), {}, {}) for identity in range(n)]
+    for r, c, v in zip(rows, cols, vals):
+        nodes[r].children[c] = v
+        nodes[c].parents[r] = v
     return OpenDigraph([], [], nodes)
 
 
-def min_distance(dic: Dict[int, int], nodes: List[int]) -> int:
+def min_distance(dic: Dict[int, int], nodes: Union[Set[int], List[int]]) -> int:
     """
-    Returns the node whose distance is the smallest
-    :param dic: Dict[int, int];
-    :param nodes: List[int];
-    :return: int; node with the smallest distance
+    Returns the node whose distance is the smallest, the first one met in dic on ties
+    :param dic: Dict[int, int]; distance of each node
+    :param nodes: Set[int]; nodes among which to look, a list is turned into a set
+    :return: int; node with the smallest distance, None if no node of nodes is in dic
     """
-    mini = None
-    for node in dic:
-        if node in nodes:
-            if mini is None:
-                mini = node
-            else:
-                if dic[node] < dic[mini]:
-                    mini = node
-    return mini
+    if not isinstance(nodes, (set, frozenset)):
+        nodes = set(nodes)
+    return min((node for node in dic if node in nodes), key=dic.__getitem__, default=None)
+
+
+def _components_csr(indptr: array, indices: array) -> array:
+    """
+    Union-find on a graph in CSR form (see OpenDigraph.to_csr), edges are taken as undirected.
+    :param indptr: array; row offsets
+    :param indices: array; column of each edge
+    :return: array; for each node, the representative of its connected component
+    """
+    n = len(indptr) - 1
+    parent = array('i', range(n))
+
+    def find(i):
+        # Path halving keeps the trees flat without recursion
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i in range(n):
+        for k in range(indptr[i], indptr[i + 1]):
+            ri, rj = find(i), find(indices[k])
+            if ri != rj:
+                parent[rj] = ri
+
+    # Flatten so that every node points directly to its representative
+    for i in range(n):
+        parent[i] = find(i)
+    return parent
@@ -1,6 +1,10 @@
 import unittest
+import importlib.util
+import random
 import sys
 import os
+import tempfile
+from collections import deque
 root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
 sys.path.append(root)  # allows us to fetch files from the project root
 from modules.open_digraph import *
@@ -35,6 +39,8 @@ class InitTest(unittest.TestCase):
         n = Node(0, 'i', {}, {1: 1})
         self.assertIsNot(n.copy(), n)
         self.assertEqual(n.copy(), n)
+        n.copy().add_child_id(2)
+        self.assertEqual(n.children, {1: 1})
 
     def test_copy_OpenDigraph(self):
         n0 = Node(0, 'i', {}, {1: 1})
@@ -43,6 +49,12 @@ class InitTest(unittest.TestCase):
         self.assertIsNot(g.copy(), g)
         self.assertEqual(g.copy(), g)
 
+        # Modifying the copy leaves the original untouched
+        g_copy = g.copy()
+        g_copy.add_edge(1, 0)
+        g_copy.get_node_by_id(0).set_label('k')
+        self.assertEqual(g, OpenDigraph([0], [1], [Node(0, 'i', {}, {1: 1}), Node(1, 'j', {0: 1}, {})]))
+
     def test_getters_Node(self):
         n = Node(0, 'i', {}, {1: 1})
         self.assertEqual(n.get_id(), n.id)
@@ -60,7 +72,7 @@ class InitTest(unittest.TestCase):
         self.assertEqual(g.get_output_ids(), g.outputs)
         self.assertEqual(g.get_id_node_map(), g.nodes)
         self.assertEqual(g.get_nodes(), [n0, n1, n2, n3])
-        self.assertEqual(g.get_node_ids(), [0, 1, 2, 3])
+        self.assertEqual(list(g.get_node_ids()), [0, 1, 2, 3])
         self.assertEqual(g.get_node_by_id(1), n1)
         self.assertEqual(g.get_nodes_by_ids([0, 2]), [n0, n2])
 
@@ -98,6 +110,10 @@ class InitTest(unittest.TestCase):
             g.set_outputs([3, 4])
             g.add_input_id(3)
             g.add_output_id(2)
+        with self.assertRaises(ValueError):
+            g1.add_input_id(2)
+        with self.assertRaises(ValueError):
+            g1.add_output_id(2)
 
     def test_eq_Node(self):
         n0 = Node(0, 'Orsay', {}, {2: 1})
@@ -126,6 +142,14 @@ class InitTest(unittest.TestCase):
         self.assertEqual(g1.new_id(), 0)
         self.assertEqual(g2.new_id(), 3)
 
+        # A node stored straight into the dict isn't overwritten by the next one
+        g3 = OpenDigraph.empty()
+        g3.add_node('a')
+        g3.nodes[1] = Node(1, 'b', {}, {})
+        self.assertEqual(g3.add_node('c'), 2)
+        self.assertEqual(g3.get_node_by_id(1).get_label(), 'b')
+        self.assertEqual(g3.max_id(), 2)
+
     def test_add_edges_OpenDigraph(self):
         # Test add_edge in the same time
         n0 = Node(0, 'Orsay', {}, {})
@@ -222,6 +246,22 @@ class InitTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             g.remove_several_parallel_edges([(1, 2), (0, 2)])
 
+    def test_remove_all_incoming_OpenDigraph(self):
+        n0 = Node(0, 'Orsay', {3: 1, 4: 1}, {1: 2})
+        n1 = Node(1, 'Le Guichet', {0: 2}, {6: 1})
+        n3 = Node(3, 'Palaiseau', {}, {0: 1})
+        n4 = Node(4, 'Villebon', {}, {0: 1})
+        n6 = Node(6, 'Bures', {1: 1}, {})
+        g = OpenDigraph([3, 4], [6], [n0, n1, n3, n4, n6])
+
+        g.remove_all_incoming(0)
+        self.assertEqual(g.get_node_by_id(0).get_parents(), {})
+        self.assertEqual(g.get_node_by_id(3).get_children(), {})
+        self.assertEqual(g.get_node_by_id(4).get_children(), {})
+        self.assertEqual(g.get_node_by_id(1).get_parents(), {0: 2})
+        with self.assertRaises(ValueError):
+            g.remove_all_incoming(2)
+
     def test_remove_id_OpenDigraph(self):
         n0 = Node(0, 'Orsay', {3: 1, 4: 1}, {})
         n1 = Node(1, 'Le Guichet', {}, {6: 1})
@@ -233,6 +273,12 @@ class InitTest(unittest.TestCase):
         g.remove_id(3)
         self.assertEqual(g, OpenDigraph([4], [6], [n0, n1, n4, n6]))
 
+        # Removing an output node updates the outputs, not the inputs
+        g.remove_id(6)
+        self.assertEqual(g.get_input_ids(), [4])
+        self.assertEqual(g.get_output_ids(), [])
+        self.assertEqual(g.get_node_by_id(1).get_children(), {})
+
     def test_remove_nodes_by_id_OpenDigraph(self):
         n0 = Node(0, 'Orsay', {3: 1, 4: 1}, {})
         n1 = Node(1, 'Le Guichet', {}, {6: 1})
@@ -281,6 +327,21 @@ class InitTest(unittest.TestCase):
             g.add_output_node(2, 7)  # 7 is not a valid parent ID
             g.add_output_node(1, 2)  # 1 is not a valid ID
 
+    def test_cache_node_changes_OpenDigraph(self):
+        # The edge is finished through the node, the cached answers must follow
+        g = OpenDigraph.empty()
+        g.add_node('a')
+        g.add_node('b', [0])
+        self.assertFalse(g.is_well_formed())
+        g.get_node_by_id(0).add_child_id(1)
+        self.assertTrue(g.is_well_formed())
+        self.assertFalse(g.is_cyclic())
+
+        # Cycle closed the same way
+        g.get_node_by_id(1).add_child_id(0)
+        g.get_node_by_id(0).add_parent_id(1)
+        self.assertTrue(g.is_cyclic())
+
     def test_is_well_formed_OpenDigraph(self):
         # Test a well-formed graph
         n0 = Node(0, 'Orsay', {3: 1, 4: 1}, {})
@@ -290,6 +351,8 @@ class InitTest(unittest.TestCase):
         n6 = Node(6, 'Bures', {1: 1}, {})
         g1 = OpenDigraph([3, 4], [6], [n0, n1, n3, n4, n6])
         self.assertTrue(g1.is_well_formed())
+        g1.add_input_id(0)  # The cached result follows the inputs
+        self.assertFalse(g1.is_well_formed())
 
         # Test a poorly-formed graph: A node with an invalid parent ID
         n3 = Node(3, 'Invalid Parent', {4: 1}, {})
@@ -397,6 +460,13 @@ class InitTest(unittest.TestCase):
         with self.assertRaises(ValueError):
             graph_from_adjacency_matrix([[1, 1, 1], [1, 1, 1]])
 
+    def test_min_distance(self):
+        dist = {4: 2, 1: 0, 3: 1, 0: 0}
+        self.assertEqual(1, min_distance(dist, [0, 1, 3]))
+        self.assertEqual(1, min_distance(dist, {0, 1}))
+        self.assertEqual(3, min_distance(dist, {3, 4}))
+        self.assertIsNone(min_distance(dist, {5}))
+
     # For these tests, we need to test if the code either is a well_formed_graph or raises an error
     # See next class how to do it correctly with no try/except
     def test_random_OpenDigraph(self):
@@ -407,6 +477,7 @@ class InitTest(unittest.TestCase):
         # DAG Form
         g = OpenDigraph.random(n=10, bound=9, form='DAG')
         self.assertTrue(g.is_well_formed())
+        self.assertFalse(g.is_cyclic())
 
         # Oriented Form
         g = OpenDigraph.random(n=10, bound=9, form='oriented')
@@ -419,6 +490,8 @@ class InitTest(unittest.TestCase):
         # Undirected Form
         g = OpenDigraph.random(n=10, bound=9, form='undirected')
         self.assertTrue(g.is_well_formed())
+        m = g.adjacency_matrix()
+        self.assertEqual(m, [list(row) for row in zip(*m)])
 
         # Loop-Free Undirected Form
         g = OpenDigraph.random(n=10, bound=9, form='loop-free_undirected')
@@ -430,6 +503,17 @@ class InitTest(unittest.TestCase):
             self.assertEqual(len(graph.get_input_ids()), 5)
             self.assertEqual(len(graph.get_output_ids()), 5)
 
+        # Chosen inputs/outputs are always possible inputs/outputs
+        built = 0
+        for _ in range(50):
+            try:
+                g = OpenDigraph.random(n=3, bound=1, inputs=1, outputs=1, form='DAG')
+            except ValueError:  # Not enough possible inputs/outputs in this draw
+                continue
+            built += 1
+            self.assertTrue(g.is_well_formed())
+        self.assertGreater(built, 0)
+
         # Invalid Form
         with self.assertRaises(ValueError):
             OpenDigraph.random(n=10, bound=9, form='invalid_form')
@@ -454,6 +538,68 @@ class InitTest(unittest.TestCase):
         g = OpenDigraph([], [], [n1, n2, n3, n4, n5])
         self.assertEqual(m, g.adjacency_matrix())
 
+        # Non-contiguous IDs are mapped to contiguous indices
+        n0 = Node(3, 'Orsay', {}, {10: 2})
+        n1 = Node(10, 'Paris', {3: 2}, {})
+        g = OpenDigraph([], [], [n0, n1])
+        self.assertEqual([[0, 2], [0, 0]], g.adjacency_matrix())
+
+        # An edge finished through the node after the CSR form was cached
+        g = OpenDigraph.empty()
+        g.add_node('a')
+        g.add_node('b', [0])
+        g.to_csr()
+        self.assertEqual([[0, 0], [0, 0]], g.adjacency_matrix())
+        g.get_node_by_id(0).add_child_id(1)
+        self.assertEqual([[0, 1], [0, 0]], g.adjacency_matrix())
+        self.assertEqual(list(g.to_csr()[1]), [1])
+
+    @unittest.skipUnless(importlib.util.find_spec('scipy'), "SciPy is not installed")
+    def test_to_scipy_sparse_OpenDigraph(self):
+        n0 = Node(0, 'Orsay', {}, {2: 1, 1: 2})
+        n1 = Node(1, 'Le Guichet', {0: 2}, {2: 1})
+        n2 = Node(2, 'Paris', {0: 1, 1: 1}, {})
+        g = OpenDigraph([], [], [n0, n1, n2])
+        self.assertEqual(g.to_scipy_sparse().toarray().tolist(), g.adjacency_matrix())
+        self.assertEqual(g.to_scipy_sparse('csc').format, 'csc')
+
+    def test_dot_file_OpenDigraph(self):
+        n1 = Node(1, 'A', {}, {2: 1})
+        n2 = Node(2, 'B', {1: 1}, {3: 2, 4: 1})
+        n3 = Node(3, 'C', {2: 2}, {})
+        n4 = Node(4, 'D', {2: 1}, {})
+        g = OpenDigraph([1], [4], [n1, n2, n3, n4])
+
+        # Saving then loading gives back the graph, in both modes
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.dot')
+            for verbose in (False, True):
+                g.save_as_dot_file(path, verbose)
+                self.assertEqual(OpenDigraph.from_dot_file(path), g)
+
+        # Edges without label, node ids not starting at 1
+        loaded_graph = OpenDigraph.from_dot_file(os.path.join(os.path.dirname(__file__), 'sample_graph.dot'))
+        self.assertEqual(loaded_graph.get_input_ids(), [0])
+        self.assertEqual(loaded_graph.get_output_ids(), [2, 3])
+        self.assertEqual(loaded_graph.get_node_by_id(0).get_label(), 'Node 0')
+        self.assertEqual(loaded_graph.get_node_by_id(1).get_children(), {2: 1, 3: 1})
+
+    def test_to_csr_OpenDigraph(self):
+        n0 = Node(0, 'Orsay', {}, {2: 1, 1: 2})
+        n1 = Node(1, 'Le Guichet', {0: 2}, {2: 1})
+        n2 = Node(2, 'Paris', {0: 1, 1: 1}, {})
+        g = OpenDigraph([], [], [n0, n1, n2])
+        indptr, indices, data = g.to_csr()
+        self.assertEqual(list(indptr), [0, 2, 3, 3])
+        self.assertEqual(list(indices), [1, 2, 2])
+        self.assertEqual(list(data), [2, 1, 1])
+        self.assertIs(g.to_csr(), g.to_csr())  # Cached
+
+        g.add_edge(2, 0)
+        indptr, indices, data = g.to_csr()
+        self.assertEqual(list(indptr), [0, 2, 3, 4])
+        self.assertEqual(list(indices), [1, 2, 2, 0])
+
     '''
     def test_save_as_dot_file_OpenDigraph(self):
         # Create a graph
@@ -553,6 +699,283 @@ class InitTest(unittest.TestCase):
         g2 = OpenDigraph([], [], [n0, n1, n2])
         self.assertTrue(g2.is_cyclic())
 
+        # Self-loop
+        g3 = OpenDigraph([], [], [Node(0, 'A', {0: 1}, {0: 1})])
+        self.assertTrue(g3.is_cyclic())
+
+        # Chain deeper than the recursion limit
+        g4 = OpenDigraph.empty()
+        g4.add_node('A')
+        for i in range(1, 2000):
+            g4.add_node('A', [i - 1])
+            g4.get_node_by_id(i - 1).add_child_id(i)
+        self.assertFalse(g4.is_cyclic())
+
+        # Same answer once the CSR form is cached
+        g2.add_edge(0, 1)
+        g2.to_csr()
+        self.assertTrue(g2.is_cyclic())
+        g4.add_edge(1999, 0)
+        g4.to_csr()
+        self.assertTrue(g4.is_cyclic())
+
+        # Edges written straight into the dicts of the nodes are seen
+        g5 = OpenDigraph.empty()
+        g5.add_node('a')
+        g5.add_node('b')
+        g5.add_edge(0, 1)
+        self.assertFalse(g5.is_cyclic())
+        self.assertEqual(g5.graph_depth(), 2)
+        self.assertTrue(g5.is_well_formed())
+        g5.nodes[1].children[0] = 1
+        g5.nodes[0].parents[1] = 1
+        self.assertTrue(g5.is_cyclic())
+        self.assertEqual(g5.graph_depth(), 0)
+        g5.get_node_by_id(0).get_children()[5] = 1
+        self.assertFalse(g5.is_well_formed())
+
+    def test_evaluate_BoolCirc(self):
+        # ~0 & 1 with its result going to the output node 4
+        n0 = Node(0, '1', {}, {2: 1})
+        n1 = Node(1, '0', {}, {3: 1})
+        n3 = Node(3, '~', {1: 1}, {2: 1})
+        n2 = Node(2, '&', {0: 1, 3: 1}, {4: 1})
+        n4 = Node(4, '', {2: 1}, {})
+        b = BoolCirc(OpenDigraph([], [4], [n0, n1, n2, n3, n4]), True)
+        b.evaluate()
+        self.assertEqual(b.g.get_node_by_id(2), Node(2, '1', {}, {4: 1}))
+        self.assertEqual(b.g.get_node_by_id(3), Node(3, '1', {}, {}))
+
+        # A whole constant subcircuit is folded in one pass: (1 ^ 1 ^ 1) | ~1 with 1 given twice to the XOR
+        n0 = Node(0, '1', {}, {2: 2, 3: 1})
+        n1 = Node(1, '1', {}, {2: 1})
+        n2 = Node(2, '^', {0: 2, 1: 1}, {4: 1})
+        n3 = Node(3, '~', {0: 1}, {4: 1})
+        n4 = Node(4, '|', {2: 1, 3: 1}, {5: 1})
+        n5 = Node(5, '', {4: 1}, {})
+        b = BoolCirc(OpenDigraph([], [5], [n0, n1, n2, n3, n4, n5]), True)
+        self.assertEqual(b._constant_fold(), 3)
+        self.assertEqual([b.g.get_node_by_id(i).get_label() for i in (2, 3, 4)], ['1', '0', '1'])
+        self.assertEqual(b.g.get_node_by_id(5).get_parents(), {4: 1})
+
+        # A copy node with a single child is erased, its parent takes its place
+        n0 = Node(0, 'x', {}, {1: 1})
+        n1 = Node(1, '', {0: 1}, {2: 1})
+        n2 = Node(2, '', {1: 1}, {})
+        b = BoolCirc(OpenDigraph([], [2], [n0, n1, n2]), True)
+        b.evaluate()
+        self.assertEqual(list(b.g.get_node_ids()), [0, 2])
+        self.assertEqual(b.g.get_node_by_id(2).get_parents(), {0: 1})
+
+        # No constant and no node with a single input: nothing can be rewritten, the circuit is left as it is
+        n0 = Node(0, 'x', {}, {2: 1})
+        n1 = Node(1, 'y', {}, {2: 1})
+        n2 = Node(2, '&', {0: 1, 1: 1}, {3: 1, 4: 1})
+        n3 = Node(3, '|', {2: 1}, {})
+        n4 = Node(4, '^', {2: 1}, {})
+        g = OpenDigraph([], [], [n0, n1, n2, n3, n4])
+        b = BoolCirc(g.copy(), True)
+        b.evaluate()
+        self.assertEqual(b.g, g)
+
+        # Wide AND/OR gates: the absorbing constant wins, a neutral one leaves the first other input
+        for gate, absorbing, neutral in (('&', '0', '1'), ('|', '1', '0')):
+            n0 = Node(0, 'x', {}, {3: 1})
+            n1 = Node(1, neutral, {}, {3: 1})
+            n2 = Node(2, absorbing, {}, {3: 1})
+            n3 = Node(3, gate, {0: 1, 1: 1, 2: 1}, {})
+            b = BoolCirc(OpenDigraph([], [], [n0, n1, n2, n3]), True)
+            (b.rule_and if gate == '&' else b.rule_or)()
+            self.assertEqual(b.g.get_node_by_id(3), Node(3, absorbing, {}, {}))
+
+            n0 = Node(0, neutral, {}, {2: 1})
+            n1 = Node(1, 'y', {}, {2: 1})
+            n2 = Node(2, gate, {0: 1, 1: 1}, {})
+            b = BoolCirc(OpenDigraph([], [], [n0, n1, n2]), True)
+            (b.rule_and if gate == '&' else b.rule_or)()
+            self.assertEqual(b.g.get_node_by_id(2), Node(2, 'y', {}, {}))
+
+        # XOR gates: a '0' leaves the first other input, a '1' its negation
+        for constant, result in (('0', 'y'), ('1', '∼y')):
+            n0 = Node(0, 'y', {}, {2: 1})
+            n1 = Node(1, constant, {}, {2: 1})
+            n2 = Node(2, 'ˆ', {0: 1, 1: 1}, {})
+            b = BoolCirc(OpenDigraph([], [], [n0, n1, n2]), True)
+            b.rule_xor()
+            self.assertEqual(b.g.get_node_by_id(2), Node(2, result, {}, {}))
+
+        # The rules don't commute, so the rewrites must happen in the same order as when every node not
+        # feeding an output is put in the worklist
+        def evaluate_every_node(b):
+            nodes = b.g.nodes
+            output_nodes = {node_id for node_id, node in nodes.items() if not node.children}
+            order = b.g._topological_order()
+            b._constant_fold(order)
+            gate_rules = {'∼': b._rule_not_at, '~': b._rule_not_at, '&': b._rule_and_at,
+                          '|': b._rule_or_at, 'ˆ': b._rule_xor_at, '^': b._rule_xor_at}
+            work = deque(node_id for node_id in order if node_id not in output_nodes)
+            in_work = set(work)
+            while work:
+                node_id = work.popleft()
+                in_work.discard(node_id)
+                node = nodes.get(node_id)
+                if node is None:
+                    continue
+                rule = gate_rules.get(node.label)
+                if rule is None and len(node.parents) == 1 and len(node.children) <= 1:
+                    rule = b._rule_erase_at if node.children else b._rule_copy_at
+                if rule is None:
+                    continue
+                neighbors = [node_id, *node.parents, *node.children]
+                if rule(node_id):
+                    for neighbor in neighbors:
+                        if neighbor in nodes and neighbor not in output_nodes and neighbor not in in_work:
+                            work.append(neighbor)
+                            in_work.add(neighbor)
+
+        state = random.getstate()
+        try:
+            for seed in range(1000):
+                random.seed(seed)
+                g = OpenDigraph.random(random.randint(3, 25), 2, form='DAG')
+                try:
+                    BoolCirc(g, True).random_bool_circ('~', '&|^', 0, 0)
+                except ValueError:
+                    continue  # Not enough nodes to choose from
+                for node in g.get_nodes():
+                    if not node.parents and random.random() < 0.6:
+                        node.label = random.choice('01')
+                expected = BoolCirc(g.copy(), True)
+                evaluate_every_node(expected)
+                b = BoolCirc(g.copy(), True)
+                b.evaluate()
+                self.assertEqual(b.g, expected.g, f"seed {seed}")
+        finally:
+            random.setstate(state)
+
+    def test_evaluate_rule_neutral_BoolCirc(self):
+        # x | ~x with ~ as a gate
+        n0 = Node(0, 'x', {}, {1: 1, 2: 1})
+        n1 = Node(1, '~', {0: 1}, {2: 1})
+        n2 = Node(2, '|', {0: 1, 1: 1}, {})
+        b = BoolCirc(OpenDigraph([], [], [n0, n1, n2]), True)
+        b.evaluate_rule_neutral()
+        self.assertEqual(b.g.get_node_by_id(2), Node(2, '1', {}, {}))
+
+        # ∼x | x with the negation in the label
+        n0 = Node(0, '∼x', {}, {2: 1})
+        n1 = Node(1, 'x', {}, {2: 1})
+        n2 = Node(2, '|', {0: 1, 1: 1}, {})
+        b = BoolCirc(OpenDigraph([], [], [n0, n1, n2]), True)
+        b.evaluate_rule_neutral()
+        self.assertEqual(b.g.get_node_by_id(2).get_label(), '1')
+
+        # x | ~y is left as it is
+        n0 = Node(0, 'x', {}, {2: 1})
+        n1 = Node(1, 'y', {}, {3: 1})
+        n3 = Node(3, '~', {1: 1}, {2: 1})
+        n2 = Node(2, '|', {0: 1, 3: 1}, {})
+        b = BoolCirc(OpenDigraph([], [], [n0, n1, n2, n3]), True)
+        b.evaluate_rule_neutral()
+        self.assertEqual(b.g.get_node_by_id(2), Node(2, '|', {0: 1, 3: 1}, {}))
+
+    def test_parse_parentheses_BoolCirc(self):
+        BoolCirc._parse_formula.cache_clear()
+        b = BoolCirc(OpenDigraph.empty(), True)
+        _, variables = b.parse_parentheses('((a|b')
+        self.assertEqual(variables, ['a', 'b'])
+        self.assertEqual(BoolCirc._parse_formula.cache_info().hits, 0)
+
+        # Read from the cache, the same nodes are added after the existing ones
+        _, variables = b.parse_parentheses('((a|b')
+        self.assertEqual(variables, ['a', 'b'])
+        self.assertEqual(BoolCirc._parse_formula.cache_info().hits, 1)
+        self.assertEqual(b.get_node_by_id(3), Node(3, '', {4: 1}, {}))
+        self.assertEqual(b.get_node_by_id(4), Node(4, '', {5: 1}, {3: 1}))
+        self.assertEqual(b.get_node_by_id(5), Node(5, 'ab', {}, {4: 1}))
+        self.assertEqual(b.max_id(), 5)
+
+        # Changing a parsed circuit doesn't change the next one read from the same formula
+        b1 = BoolCirc(OpenDigraph.empty(), True)
+        _, variables = b1.parse_parentheses('(x|(y&z')
+        expected = [node.copy() for node in b1.get_nodes()]
+        for node in b1.get_nodes():
+            node.label = '1'
+            node.children[42] = 1
+        variables.append('t')
+        b2 = BoolCirc(OpenDigraph.empty(), True)
+        _, variables = b2.parse_parentheses('(x|(y&z')
+        self.assertEqual(b2.get_nodes(), expected)
+        self.assertEqual(variables, ['x', 'y', 'z'])
+
+        # A closing parenthesis without a matching node is reported as such, every time
+        b = BoolCirc(OpenDigraph.empty(), True)
+        for _ in range(2):
+            with self.assertRaises(ValueError):
+                b.parse_parentheses('a)')
+
+    def test_int_to_register_circuit_BoolCirc(self):
+        n0 = Node(0, 'x', {}, {})
+        b = BoolCirc(OpenDigraph([], [], [n0]), True)
+        b.int_to_register_circuit(5, 4)
+        self.assertEqual(b.g.get_node_by_id(1), Node(1, '0', {}, {2: 1}))
+        self.assertEqual(b.g.get_node_by_id(2), Node(2, '1', {1: 1}, {3: 1}))
+        self.assertEqual(b.g.get_node_by_id(3), Node(3, '0', {2: 1}, {4: 1}))
+        self.assertEqual(b.g.get_node_by_id(4), Node(4, '1', {3: 1}, {}))
+        self.assertEqual(b.g.get_node_by_id(0), n0)
+        self.assertEqual(b.g.max_id(), 4)
+
+        # A number wider than the register keeps all its bits
+        b = BoolCirc(OpenDigraph.empty(), True)
+        b.int_to_register_circuit(6, 2)
+        self.assertEqual([node.get_label() for node in b.g.get_nodes()], ['1', '1', '0'])
+        self.assertEqual(b.g.get_node_by_id(2).get_parents(), {1: 1})
+        self.assertTrue(b.g.is_well_formed())
+        self.assertRaises(ValueError, b.int_to_register_circuit, -1, 4)
+
+    def test_rule_involution_BoolCirc(self):
+        # Ids don't start at 0, the new gates take the ids given by add_node
+        n3 = Node(3, 'x', {}, {10: 1})
+        n5 = Node(5, 'y', {}, {10: 1})
+        n7 = Node(7, 'z', {}, {10: 1})
+        n8 = Node(8, 't', {}, {10: 1})
+        n10 = Node(10, 'ˆ', {3: 1, 5: 1, 7: 1, 8: 1}, {})
+        b = BoolCirc(OpenDigraph([], [], [n3, n5, n7, n8, n10]), True)
+        b.rule_involution()
+        self.assertEqual(b.g.get_node_by_id(11).get_parents(), {3: 1, 5: 1})
+        self.assertEqual(b.g.get_node_by_id(12).get_parents(), {7: 1, 8: 1})
+
+        # Odd number of inputs, the last one joins the last pair
+        n3 = Node(3, 'x', {}, {10: 1})
+        n5 = Node(5, 'y', {}, {10: 1})
+        n7 = Node(7, 'z', {}, {10: 1})
+        n10 = Node(10, 'ˆ', {3: 1, 5: 1, 7: 1}, {})
+        b = BoolCirc(OpenDigraph([], [], [n3, n5, n7, n10]), True)
+        b.rule_involution()
+        self.assertEqual(b.g.get_node_by_id(11).get_parents(), {3: 1, 5: 1, 7: 1})
+
+    def test_random_bool_circ_BoolCirc(self):
+        # Node 2 has two parents and two children, it's split in two
+        n0 = Node(0, '', {}, {2: 1})
+        n1 = Node(1, '', {}, {2: 1})
+        n2 = Node(2, '', {0: 1, 1: 1}, {3: 1, 4: 1})
+        n3 = Node(3, '', {2: 1}, {})
+        n4 = Node(4, '', {2: 1}, {})
+        g = OpenDigraph([], [], [n0, n1, n2, n3, n4])
+        b = BoolCirc(g, True)
+        b.random_bool_circ('~', '&', 2, 2)
+        self.assertEqual(g.get_node_by_id(2), Node(2, '&', {0: 1, 1: 1}, {5: 1}))
+        self.assertEqual(g.get_node_by_id(5), Node(5, '', {2: 1}, {3: 1, 4: 1}))
+        self.assertEqual(g.get_node_by_id(3).get_parents(), {5: 1})
+        self.assertEqual(sorted(g.get_input_ids()), [0, 1])
+        self.assertEqual(sorted(g.get_output_ids()), [3, 4])
+        self.assertTrue(g.is_well_formed())
+
+    def test_carry_lookahead_adder_BoolCirc(self):
+        b = BoolCirc(OpenDigraph.empty(), True)
+        with self.assertRaises(ValueError):
+            b.carry_lookahead_adder(-1)
+
     def test_is_well_formed_BoolCirc(self):
         # Well-formed BoolCirc
         n0 = Node(0, '&', {3: 1, 4: 1}, {})
@@ -603,6 +1026,27 @@ class InitTest(unittest.TestCase):
         self.assertEqual(g.max_id(), 6)
         self.assertEqual(g.min_id(), 0)
 
+        # Cached values follow the modifications of the graph
+        self.assertEqual(g.add_node('&'), 7)
+        self.assertEqual(g.max_id(), 7)
+        g.remove_nodes_by_id([0, 7])
+        self.assertEqual(g.max_id(), 6)
+        self.assertEqual(g.min_id(), 1)
+        self.assertEqual(g.new_id(), 7)
+        g.merge_nodes(4, 6)
+        self.assertEqual((g.min_id(), g.max_id()), (1, 4))
+        g.shift_indices(2)
+        self.assertEqual((g.min_id(), g.max_id()), (3, 6))
+
+        # Edges don't move the extrema, an id changed through the node does
+        g.add_edges([(3, 5), (5, 6)])
+        g.remove_edge(6, 5)
+        self.assertFalse(g._dirty)
+        g.get_node_by_id(6).set_id(9)
+        self.assertEqual(g.max_id(), 9)
+        g.get_node_by_id(3).set_id(0)
+        self.assertEqual(g.min_id(), 0)
+
     def test_shift_indices_OpenDigraph(self):
         n0 = Node(0, '&', {3: 1, 4: 1}, {})
         n1 = Node(1, '&', {}, {6: 1})
@@ -618,8 +1062,12 @@ class InitTest(unittest.TestCase):
         g1 = OpenDigraph([3, 4], [6], [n0, n1, n3, n4, n6])
         g2 = OpenDigraph([4, 5], [7], [n7, n8, n9, n10, n11])
 
+        csr = g1.to_csr()
         g1.shift_indices(1)
         self.assertEqual(g1, g2)
+        self.assertEqual(list(g1.get_node_ids()), [1, 2, 4, 5, 7])
+        self.assertEqual(g1.to_csr(), csr)
+        self.assertTrue(g1.is_well_formed())
         g1.shift_indices(-1)
         self.assertEqual(g1, g)
 
@@ -637,6 +1085,19 @@ class InitTest(unittest.TestCase):
         self.assertEqual(g1, g1_bis)
         self.assertEqual(g, g2)
 
+        # Overlapping ids are shifted, nodes are stored under their new id
+        h = OpenDigraph([0], [1], [Node(0, 'a', {}, {1: 1}), Node(1, 'b', {0: 1}, {})])
+        h.iparallel(h.copy())
+        self.assertEqual(h.get_input_ids(), [0, 2])
+        self.assertEqual(h.get_node_by_id(3), Node(3, 'b', {2: 1}, {}))
+        self.assertTrue(h.is_well_formed())
+
+        # Same result when h2 is handed over instead of copied
+        h2 = OpenDigraph([0], [1], [Node(0, 'a', {}, {1: 1}), Node(1, 'b', {0: 1}, {})])
+        h3 = OpenDigraph([0], [1], [Node(0, 'a', {}, {1: 1}), Node(1, 'b', {0: 1}, {})])
+        h3.iparallel(h2, copy=False)
+        self.assertEqual(h3, h)
+
     def test_parallel_OpenDigraph(self):
         n0 = Node(0, '&', {}, {})
         n1 = Node(1, '&', {}, {})
@@ -690,6 +1151,7 @@ class InitTest(unittest.TestCase):
         f3 = OpenDigraph()
         f4 = OpenDigraph()
         f3.compose(f, f1)
+        self.assertEqual(f.get_node_by_id(0).get_parents(), {})
         self.assertEqual(f, f_bis)
         self.assertEqual(f1, f1_bis)
         self.assertEqual(f2, f3)
@@ -725,6 +1187,122 @@ class InitTest(unittest.TestCase):
         self.assertEqual(dist, {0: 0, 1: 1, 2: 1})
         self.assertEqual(prev, {1: 0, 2: 0})
 
+        # An undirected search walks parents and children without merging them into the node
+        g.dijkstra(1)
+        self.assertEqual(g.get_node_by_id(1), Node(1, '&', {0: 1}, {2: 1}))
+        self.assertTrue(g.is_well_formed())
+
+        # Directed searches, the graph itself is left untouched
+        self.assertEqual(g.dijkstra(2, -1), ({2: 0, 1: 1, 0: 1}, {1: 2, 0: 2}))
+        self.assertEqual(g.dijkstra(2, 1), ({2: 0}, {}))
+        self.assertEqual(g.get_node_by_id(2).get_children(), {})
+        self.assertRaises(ValueError, g.dijkstra, 0, 2)
+
+        # Shortest paths, including the empty path and an unreachable node
+        self.assertEqual(g.shortest_path(1, 0), [1, 0])
+        self.assertEqual(g.shortest_path(2, 2), [2])
+        g.add_node('|')
+        self.assertRaises(ValueError, g.shortest_path, 0, 3)
+
+    def test_common_ancestors_distances_OpenDigraph(self):
+        # 0 -> 1 -> 3, 0 -> 2 -> 3, 2 -> 4
+        n0 = Node(0, 'a', {}, {1: 1, 2: 1})
+        n1 = Node(1, 'b', {0: 1}, {3: 1})
+        n2 = Node(2, 'c', {0: 1}, {3: 1, 4: 1})
+        n3 = Node(3, 'd', {1: 1, 2: 1}, {})
+        n4 = Node(4, 'e', {2: 1}, {})
+        g = OpenDigraph([], [], [n0, n1, n2, n3, n4])
+        # The searches go through parents and children, the nodes themselves are included
+        self.assertEqual(g.common_ancestors_distances(3, 4),
+                         {0: (2, 2), 1: (1, 3), 2: (1, 1), 3: (0, 2), 4: (2, 0)})
+        self.assertEqual(g.common_ancestors_distances(2, 4),
+                         {0: (1, 2), 1: (2, 3), 2: (0, 1), 3: (1, 2), 4: (1, 0)})
+
+        # Searches are cached until the graph changes
+        dist, _ = g.dijkstra(4, -1)
+        dist[4] = 10
+        self.assertEqual(g.dijkstra(4, -1)[0], {4: 0, 2: 1, 0: 2})
+        self.assertEqual(len(g._cache['dijkstra'][1]), 4)
+        g.add_edge(1, 4)
+        self.assertNotIn('dijkstra', g._cache)  # The old searches are dropped with the version
+        self.assertEqual(g.common_ancestors_distances(3, 4),
+                         {0: (2, 2), 1: (1, 1), 2: (1, 1), 3: (0, 2), 4: (2, 0)})
+        self.assertEqual(len(g._cache['dijkstra'][1]), 2)
+
+        # At most 256 searches are kept, the least recently used goes first
+        chain = OpenDigraph.empty()
+        chain.add_node('a')
+        for i in range(1, 300):
+            chain.add_node('a')
+            chain.add_edge(i - 1, i)
+        chain.dijkstra(0)
+        for i in range(1, 300):
+            chain.dijkstra(i)
+            chain.dijkstra(0)
+        runs = chain._cache['dijkstra'][1]
+        self.assertEqual(len(runs), 256)
+        self.assertIn((0, None), runs)
+        self.assertNotIn((1, None), runs)
+
+    def test_topological_sort_OpenDigraph(self):
+        n0 = Node(0, 'Orsay', {3: 1, 4: 1}, {})
+        n1 = Node(1, 'Le Guichet', {}, {6: 1})
+        n3 = Node(3, 'Palaiseau', {}, {0: 1})
+        n4 = Node(4, 'Villebon', {}, {0: 1})
+        n6 = Node(6, 'Bures', {1: 1}, {})
+        g = OpenDigraph([3, 4], [6], [n0, n1, n3, n4, n6])
+        self.assertEqual(g.topological_sort(), [{1, 3, 4}, {0, 6}])
+        self.assertEqual(g.graph_depth(), 2)
+
+        # Each call gets its own copy, changing it doesn't touch the cached sort
+        t = g.topological_sort()
+        t[0].add(99)
+        t.append({5})
+        self.assertEqual(g.topological_sort(), [{1, 3, 4}, {0, 6}])
+        self.assertEqual(g.graph_depth(), 2)
+        self.assertEqual(sorted(g._topological_order()), [0, 1, 3, 4, 6])
+
+        # Longest paths, here the only path from 4 to 0
+        self.assertEqual(g.longest_path(4, 0, g.topological_sort()), (1, [4, 0]))
+        self.assertEqual(g.max_path_and_distance(4, 0), ([4, 0], 1))
+
+        # The longest path isn't the shortest one
+        diamond = OpenDigraph([], [], [Node(0, 'a', {}, {1: 1, 3: 1}), Node(1, 'b', {0: 1}, {2: 1}),
+                                       Node(2, 'c', {1: 1}, {3: 1}), Node(3, 'd', {0: 1, 2: 1}, {})])
+        self.assertEqual(diamond.max_path_and_distance(0, 3), ([0, 1, 2, 3], 3))
+        self.assertEqual(diamond.longest_path(0, 3, diamond.topological_sort()), (3, [0, 1, 2, 3]))
+        self.assertEqual(diamond.max_path_and_distance(3, 0), ([0], -float('inf')))
+        self.assertEqual(diamond.longest_path(0, 2), (2, [0, 1, 2]))
+
+        # A cycle can't be sorted
+        n0 = Node(0, 'A', {2: 1}, {1: 1})
+        n1 = Node(1, 'B', {0: 1}, {2: 1})
+        n2 = Node(2, 'C', {1: 1}, {0: 1})
+        self.assertRaises(ValueError, OpenDigraph([], [], [n0, n1, n2]).topological_sort)
+        self.assertEqual(OpenDigraph([], [], [n0, n1, n2]).graph_depth(), 0)
+
+    def test_components_OpenDigraph(self):
+        # Non-contiguous ids, three components: {0, 3}, the isolated node 1 and {5, 7}
+        n0 = Node(0, 'a', {}, {3: 1})
+        n3 = Node(3, 'b', {0: 1}, {})
+        n1 = Node(1, 'c', {}, {})
+        n5 = Node(5, 'd', {7: 2}, {})
+        n7 = Node(7, 'e', {}, {5: 2})
+        g = OpenDigraph([0, 7], [3, 5], [n0, n3, n1, n5, n7])
+        cpt, dic, res = g.connected_components()
+        self.assertEqual(cpt, 3)
+        self.assertEqual(dic, {0: 0, 3: 0, 1: 1, 5: 2, 7: 2})
+        self.assertEqual(res[0], OpenDigraph([0], [1], [Node(0, 'a', {}, {1: 1}), Node(1, 'b', {0: 1}, {})]))
+        self.assertEqual(res[2], OpenDigraph([1], [0], [Node(0, 'd', {1: 2}, {}), Node(1, 'e', {}, {0: 2})]))
+
+        # A chain deeper than the recursion limit is a single component
+        chain = OpenDigraph.empty()
+        chain.add_node('A')
+        for i in range(1, 2000):
+            chain.add_node('A', [i - 1])
+            chain.get_node_by_id(i - 1).add_child_id(i)
+        self.assertEqual(chain.connected_components()[0], 1)
+
     '''
     def test_hamming_BoolCirc(self):
         code_hamming = BoolCirc()